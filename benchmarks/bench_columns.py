@@ -0,0 +1,46 @@
+""" Hit rate of the column classification table of the tokenizer, and tokenizing time.
+
+    The table is shared by the tokenizers: it starts empty, then files benefit from the
+    columns met in the previous ones.
+
+    python -m benchmarks.bench_columns [--repeat N]
+"""
+from argparse import ArgumentParser
+import time
+from benchmarks.common import corpus_files
+from btab2mxml.btab.btab_reader import BtabMmapReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+
+
+def main():
+    parser = ArgumentParser(description="Column classification table of the tokenizer")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs on the corpus (best is kept)")
+    args = parser.parse_args()
+
+    BtabTokenizer.column_classes.clear()
+    hits = misses = 0
+    print(f'{"file":40} {"columns":>8} {"misses":>7} {"hit rate":>9}')
+    for file_name in corpus_files():
+        tokenizer = BtabTokenizer(BtabMmapReader(file_name))
+        for _ in tokenizer:
+            pass
+        info = tokenizer.column_cache_info()
+        hits += info['hits']
+        misses += info['misses']
+        print(f'{file_name.name:40} {info["hits"] + info["misses"]:8} {info["misses"]:7} {info["hit_rate"]:9.1%}')
+    print(f'{"TOTAL":40} {hits + misses:8} {misses:7} {hits / (hits + misses):9.1%}')
+    print(f'distinct columns: {sum(len(columns) for columns in BtabTokenizer.column_classes.values())}')
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for file_name in corpus_files():
+            for _ in BtabTokenizer(BtabMmapReader(file_name)):
+                pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'tokenizing the corpus: {best * 1000:.1f} ms')
+
+
+if __name__ == "__main__":
+    main()
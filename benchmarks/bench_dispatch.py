@@ -0,0 +1,94 @@
+""" Per-token overhead of BtabParser token dispatch, on the tokens of the bundled corpus.
+
+    Compares the dispatch table with the former isinstance chain (same branch order),
+    handlers being no-ops so that only the dispatch itself is timed, then times the
+    whole parse of the recorded tokens.
+
+    python -m benchmarks.bench_dispatch [--repeat N]
+"""
+from argparse import ArgumentParser
+import logging
+import time
+from benchmarks.common import corpus_files, ReplayTokenizer
+from btab2mxml.btab.btab_parser import BtabParser
+from btab2mxml.btab.btab_reader import BtabReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.token import *
+
+# Branch order of the former BtabParser._handle_token
+chain = (MeasureBarToken, StartRepetitionToken, EndRepetitionToken, RepetionNumberToken,
+         TimeSignatureToken, NoteToken, TieToken, TiedNoteToken, RestToken, LongRestToken,
+         TrioletToken, (GlissDownToken, GlissUpToken), BendToken, NbStringsToken,
+         (HammerOnToken, PullOffToken))
+
+
+def noop(parser, token):
+    pass
+
+
+class NoopParser(BtabParser):
+    pass
+
+
+for token_class in BtabParser.token_handlers:
+    NoopParser.register_token_handler(token_class, noop)
+
+
+def isinstance_dispatch(parser, token):
+    for token_class in chain:
+        if isinstance(token, token_class):
+            noop(parser, token)
+            return
+
+
+def record_tokens(files):
+    return [list(BtabTokenizer(BtabReader(file_name))) for file_name in files]
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = ArgumentParser(description="Time the token dispatch of BtabParser")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of runs (best is kept)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    recorded = record_tokens(corpus_files())
+    score_tokens = [t for tokens in recorded for t in tokens
+                    if not isinstance(t, (HeaderLineToken, EndToken))]
+    noop_parser = NoopParser(None)
+
+    def run_chain():
+        for token in score_tokens:
+            isinstance_dispatch(noop_parser, token)
+
+    def run_table():
+        handle_token = noop_parser._handle_token
+        for token in score_tokens:
+            handle_token(token)
+
+    nb_tokens = len(score_tokens)
+    for name, function in (('isinstance chain', run_chain), ('dispatch table', run_table)):
+        best = best_time(function, args.repeat)
+        print(f'{name:16} {nb_tokens} tokens in {best * 1000:.2f} ms '
+              f'({best / nb_tokens * 1e9:.0f} ns/token)')
+
+    def run_parse():
+        for tokens in recorded:
+            BtabParser(ReplayTokenizer(tokens)).parse()
+
+    best = best_time(run_parse, max(1, args.repeat // 10))
+    print(f'{"full parse":16} {nb_tokens} tokens in {best * 1000:.2f} ms '
+          f'({best / nb_tokens * 1e6:.1f} us/token)')
+
+
+if __name__ == "__main__":
+    main()
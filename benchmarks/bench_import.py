@@ -0,0 +1,54 @@
+""" Import-time benchmark of the CLI modules, based on 'python -X importtime'.
+
+    python -m benchmarks.bench_import [--module M] [--repeat N] [--max-ms MS]
+
+    Exits with status 1 if music21 gets imported, or if the best cumulative import
+    time is above --max-ms.
+"""
+from argparse import ArgumentParser
+import subprocess
+import sys
+
+
+def import_times(module):
+    """ Return {module name: cumulative import time in µs} for a fresh interpreter importing module.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = ArgumentParser(description="Measure the import time of a btab2mxml module")
+    parser.add_argument("--module", default='btab2mxml.main', help="Module to import (default: btab2mxml.main)")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs (best is kept)")
+    parser.add_argument("--max-ms", type=float, help="Fail above this cumulative import time")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.repeat):
+        times = import_times(args.module)
+        best = times[args.module] if best is None else min(best, times[args.module])
+    heavy = sorted(((t, n) for n, t in times.items() if '.' not in n), reverse=True)[:5]
+    print(f'{args.module}: {best / 1000:.1f} ms')
+    for t, n in heavy:
+        print(f'  {n:20} {t / 1000:.1f} ms')
+
+    failed = False
+    if 'music21' in times:
+        print('music21 is imported')
+        failed = True
+    if args.max_ms is not None and best / 1000 > args.max_ms:
+        print(f'Import time above {args.max_ms} ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
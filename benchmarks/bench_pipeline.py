@@ -0,0 +1,206 @@
+""" Per-stage benchmark of the conversion pipeline, on the corpus and on synthetic tabs.
+
+    python -m benchmarks.bench_pipeline [--measures N ...] [--json results.json] [--compare old.json]
+
+    Stages are timed separately: reader (all staff symbols), tokenizer (tokens, minus
+    the reader time), parse (BtabParser.parse fed with recorded tokens) and output
+    (BtabParser.output, for each writer). Throughput is given in source measures per
+    second, peak memory is the tracemalloc peak of a full conversion, and peak RSS the
+    maximum resident size of a process running one full conversion (also for the
+    streaming writer).
+"""
+from argparse import ArgumentParser
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from benchmarks.common import ReplayTokenizer, corpus_files, count_bars, split_tab, synthetic_tab
+from btab2mxml.btab.btab_reader import BtabReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.btab_parser import BtabParser
+
+writers = ('music21', 'direct')
+rss_writers = writers + ('stream',)
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def read_symbols(file_name):
+    reader = BtabReader(file_name)
+    while reader.get_next_score_symbol() is not None:
+        pass
+
+
+def parse_tokens(tokens):
+    parser = BtabParser(ReplayTokenizer(tokens))
+    parser.parse()
+    return parser
+
+
+def convert(file_name, out_file, writer):
+    parser = BtabParser(BtabTokenizer(BtabReader(file_name)))
+    parser.parse()
+    parser.output(out_file, writer=writer)
+
+
+# Maximum resident size in KiB: ru_maxrss survives exec on Linux (a child would report
+#   the parent's peak), VmHWM does not
+peak_rss_code = '''
+import resource
+try:
+    with open('/proc/self/status') as f:
+        print(next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')))
+except OSError:
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def peak_rss(file_name, out_file, writer):
+    """ Maximum resident size, in KiB, of a new process converting file_name.
+    """
+    code = ('import sys; from btab2mxml.main import convert_file; '
+            'convert_file(sys.argv[1], sys.argv[2], writer=sys.argv[3])' + peak_rss_code)
+    result = subprocess.run([sys.executable, '-c', code, str(file_name), str(out_file), writer],
+                            capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent)
+    return int(result.stdout.split()[-1])
+
+
+def bench_file(file_name, out_dir, repeat, with_memory):
+    stages = {}
+    stages['reader'], _ = best_time(lambda: read_symbols(file_name), repeat)
+    tokenize, tokens = best_time(lambda: list(BtabTokenizer(BtabReader(file_name))), repeat)
+    stages['tokenizer'] = max(tokenize - stages['reader'], 0)
+    stages['parse'], _ = best_time(lambda: parse_tokens(tokens), repeat)
+    for writer in writers:
+        out_file = out_dir / f'{Path(file_name).stem}.{writer}.xml'
+        # Output mutates the parser (the part is inserted into the score): parse each time
+        parsers = [parse_tokens(tokens) for _ in range(repeat)]
+        stages[f'output_{writer}'], _ = best_time(lambda: parsers.pop().output(out_file, writer=writer), repeat)
+
+    _, blocks = split_tab(Path(file_name).read_text())
+    result = {
+        'file': Path(file_name).name,
+        'measures': sum(count_bars(b) for b in blocks),
+        'tokens': len(tokens),
+        'stages': stages,
+    }
+    if with_memory:
+        result['peak_memory'] = {}
+        for writer in writers:
+            tracemalloc.start()
+            convert(file_name, out_dir / f'{Path(file_name).stem}.{writer}.xml', writer)
+            result['peak_memory'][writer] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        result['peak_rss_kb'] = {writer: peak_rss(file_name, out_dir / f'{Path(file_name).stem}.{writer}.xml', writer)
+                                 for writer in rss_writers}
+    return result
+
+
+def aggregate(results):
+    total = {'measures': sum(r['measures'] for r in results), 'stages': {}}
+    for stage in results[0]['stages']:
+        total['stages'][stage] = sum(r['stages'][stage] for r in results)
+    for writer in writers:
+        elapsed = sum(v for k, v in total['stages'].items() if not k.startswith('output_')) \
+            + total['stages'][f'output_{writer}']
+        total[f'measures_per_second_{writer}'] = total['measures'] / elapsed if elapsed else 0
+    if all('peak_memory' in r for r in results):
+        total['peak_memory'] = {w: max(r['peak_memory'][w] for r in results) for w in writers}
+        total['peak_rss_kb'] = {w: max(r['peak_rss_kb'][w] for r in results) for w in rss_writers}
+    return total
+
+
+def print_results(title, results, total):
+    stages = list(total['stages'])
+    print(f'\n{title}')
+    print(f'{"file":40} {"meas.":>6} ' + ' '.join(f'{s:>15}' for s in stages))
+    for r in results + [dict(total, file='TOTAL')]:
+        print(f'{r["file"]:40} {r["measures"]:6} ' + ' '.join(f'{r["stages"][s] * 1000:13.2f}ms' for s in stages))
+    for writer in writers:
+        line = f'  {writer}: {total[f"measures_per_second_{writer}"]:,.0f} measures/s'
+        if 'peak_memory' in total:
+            line += f', peak memory {total["peak_memory"][writer] / 1e6:.1f} MB'
+        print(line)
+    if 'peak_rss_kb' in total:
+        print('  peak RSS: ' + ', '.join(f'{w} {total["peak_rss_kb"][w] / 1024:.1f} MB' for w in rss_writers))
+
+
+def compare(current, previous):
+    """ Print the relative change of each aggregated stage time against a previous run.
+    """
+    for suite, total in current['suites'].items():
+        if suite not in previous.get('suites', {}):
+            continue
+        old = previous['suites'][suite]['total']['stages']
+        print(f'\n{suite} vs {previous.get("commit", "previous run")}')
+        for stage, elapsed in total['total']['stages'].items():
+            if old.get(stage):
+                print(f'  {stage:16} {(elapsed - old[stage]) / old[stage] * 100:+7.1f}%')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark each stage of the btab2mxml pipeline")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs per stage (best is kept)")
+    parser.add_argument("--measures", type=int, nargs='*', default=[1000],
+                        help="Sizes of the synthetic tabs, in measures (default: 1000)")
+    parser.add_argument("--strings", type=int, nargs='*', default=[4, 5], help="Synthetic tabs strings")
+    parser.add_argument("--no-corpus", action='store_true', help="Skip the corpus files")
+    parser.add_argument("--no-memory", action='store_true', help="Skip the peak memory measure")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Compare with the JSON results of a previous run")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'suites': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        suites = []
+        if not args.no_corpus:
+            suites.append(('corpus', corpus_files()))
+        for nb_strings in args.strings:
+            for nb_measures in args.measures:
+                file_name = tmp / f'synthetic_{nb_strings}_strings_{nb_measures}.btab'
+                file_name.write_text(synthetic_tab(nb_measures, nb_strings))
+                suites.append((file_name.stem, [file_name]))
+        for name, files in suites:
+            results = [bench_file(f, tmp, args.repeat, not args.no_memory) for f in files]
+            total = aggregate(results)
+            report['suites'][name] = {'files': results, 'total': total}
+            print_results(name, results, total)
+    report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=1))
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+""" Microbenchmark of the staff readers on the bundled corpus.
+
+    python -m benchmarks.bench_reader [--repeat N]
+"""
+from argparse import ArgumentParser
+import time
+from benchmarks.common import corpus_files
+from btab2mxml.btab.btab_reader import BtabReader, BtabBlockReader, BtabMmapReader
+
+
+def read_all_symbols(reader_class, file_name):
+    reader = reader_class(file_name)
+    nb_symbols = 0
+    while reader.get_next_score_symbol() is not None:
+        nb_symbols += 1
+    return nb_symbols
+
+
+def bench(reader_class, files, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        nb_symbols = sum(read_all_symbols(reader_class, f) for f in files)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return nb_symbols, best
+
+
+def main():
+    parser = ArgumentParser(description="Compare staff readers on the tablatures corpus")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of runs (best is kept)")
+    args = parser.parse_args()
+
+    files = corpus_files()
+    for reader_class in (BtabReader, BtabBlockReader, BtabMmapReader):
+        nb_symbols, best = bench(reader_class, files, args.repeat)
+        print(f'{reader_class.__name__:16} {nb_symbols} symbols in {best * 1000:.2f} ms '
+              f'({nb_symbols / best:,.0f} symbols/s)')
+
+
+if __name__ == "__main__":
+    main()
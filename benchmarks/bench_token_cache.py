@@ -0,0 +1,60 @@
+""" Token stream cache: tokenizing the files, compared with replaying their cache
+    (hashing the source and loading the cache file), and size of the caches.
+
+    python -m benchmarks.bench_token_cache [--repeat N] [--measures N]
+"""
+from argparse import ArgumentParser
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import corpus_files, synthetic_tab
+from btab2mxml.btab.btab_reader import BtabMmapReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.token_cache import cached_tokenizer, get_cache_file
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = ArgumentParser(description="Token stream cache")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of runs (best is kept)")
+    parser.add_argument("--measures", type=int, default=2000, help="Size of the synthetic tab, in measures")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic = Path(tmp) / 'synthetic.btab'
+        synthetic.write_text(synthetic_tab(args.measures))
+        for name, files in (('corpus', corpus_files()), ('synthetic', [synthetic])):
+            cache_dir = Path(tmp) / name
+            for file_name in files:
+                # Write the caches
+                list(cached_tokenizer(file_name, cache_dir))
+
+            def tokenize():
+                for file_name in files:
+                    list(BtabTokenizer(BtabMmapReader(file_name)))
+
+            def replay():
+                for file_name in files:
+                    list(cached_tokenizer(file_name, cache_dir))
+
+            tokenize_time = best_time(tokenize, args.repeat)
+            replay_time = best_time(replay, args.repeat)
+            source_size = sum(f.stat().st_size for f in files)
+            cache_size = sum(get_cache_file(f, cache_dir).stat().st_size for f in files)
+            print(name)
+            print(f'  tokenize {tokenize_time * 1000:8.2f} ms')
+            print(f'  replay   {replay_time * 1000:8.2f} ms ({tokenize_time / replay_time:.1f}x)')
+            print(f'  size     {cache_size:8} bytes ({cache_size / source_size:.0%} of the sources)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+""" Comparison of the tokenizer backends: pure Python and NumPy (when installed).
+
+    The NumPy backend skips the runs of blank columns of the staff blocks: it pays on
+    tabs spaced out with many blank columns, not on dense ones.
+
+    python -m benchmarks.bench_tokenizers [--repeat N] [--measures N] [--spread N]
+"""
+from argparse import ArgumentParser
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import corpus_files, synthetic_tab
+from btab2mxml.btab.btab_numpy_tokenizer import create_tokenizer, numpy
+from btab2mxml.btab.btab_reader import BtabMmapReader
+
+
+def tokenize(files, backend):
+    nb_tokens = 0
+    for file_name in files:
+        for _ in create_tokenizer(BtabMmapReader(file_name), backend):
+            nb_tokens += 1
+    return nb_tokens
+
+
+def bench(files, backend, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        nb_tokens = tokenize(files, backend)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return nb_tokens, best
+
+
+def main():
+    parser = ArgumentParser(description="Compare the tokenizer backends")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of runs (best is kept)")
+    parser.add_argument("--measures", type=int, default=1000, help="Size of the synthetic tabs, in measures")
+    parser.add_argument("--spread", type=int, default=8, help="Blank columns added after each blank column"
+                                                               " of the spread synthetic tab")
+    args = parser.parse_args()
+    if numpy is None:
+        print('numpy is not installed: only the Python backend is available')
+    backends = ('python', 'numpy') if numpy is not None else ('python',)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dense = Path(tmp) / 'dense.btab'
+        dense.write_text(synthetic_tab(args.measures))
+        spread = Path(tmp) / 'spread.btab'
+        spread.write_text(synthetic_tab(args.measures, spread=args.spread))
+        for name, files in (('corpus', corpus_files()), ('synthetic', [dense]), ('spread synthetic', [spread])):
+            print(name)
+            for backend in backends:
+                nb_tokens, best = bench(files, backend, args.repeat)
+                print(f'  {backend:8} {nb_tokens} tokens in {best * 1000:.2f} ms ({nb_tokens / best:,.0f} tokens/s)')
+
+
+if __name__ == "__main__":
+    main()
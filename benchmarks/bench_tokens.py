@@ -0,0 +1,44 @@
+""" Memory taken by the tokens of the whole bundled corpus.
+
+    Tokens are kept in memory (as a parser replaying them would), then the memory
+    they retain is measured with tracemalloc, with the number of distinct token
+    objects per class (valueless tokens are interned).
+
+    python -m benchmarks.bench_tokens
+"""
+from collections import Counter
+import gc
+import tracemalloc
+from benchmarks.common import corpus_files
+from btab2mxml.btab.btab_reader import BtabReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+
+
+def tokenize_corpus(files):
+    return [list(BtabTokenizer(BtabReader(file_name))) for file_name in files]
+
+
+def main():
+    files = corpus_files()
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    recorded = tokenize_corpus(files)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained -= start
+    peak -= start
+
+    tokens = [t for file_tokens in recorded for t in file_tokens]
+    counts = Counter(t.__class__.__name__ for t in tokens)
+    objects = Counter(t.__class__.__name__ for t in {id(t): t for t in tokens}.values())
+    print(f'{len(files)} files, {len(tokens)} tokens, {sum(objects.values())} token objects')
+    print(f'retained {retained / 1024:.1f} KiB ({retained / len(tokens):.1f} bytes/token), '
+          f'peak {peak / 1024:.1f} KiB')
+    for name, count in counts.most_common():
+        print(f'  {name:22} {count:6} tokens {objects[name]:6} objects')
+
+
+if __name__ == "__main__":
+    main()
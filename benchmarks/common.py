@@ -0,0 +1,97 @@
+""" Helpers shared by the benchmarks: corpus access, synthetic tablatures and replay objects.
+"""
+from itertools import cycle
+from pathlib import Path
+import re
+
+corpus = Path(__file__).parent.parent / 'tablatures' / '2112'
+
+
+def corpus_files():
+    return sorted(corpus.glob('*.btab'))
+
+
+def split_tab(text):
+    """ Split a tablature into its header lines and its staff blocks (lists of lines).
+    """
+    lines = text.split('\n')
+    index = next(i for i, line in enumerate(lines) if line.startswith(' '))
+    header = lines[:index]
+    blocks = []
+    block = []
+    for line in lines[index:]:
+        if line == 'end' or line.startswith('='):
+            break
+        if line.strip():
+            block.append(line)
+        elif block:
+            blocks.append(block)
+            block = []
+    if block:
+        blocks.append(block)
+    return header, blocks
+
+
+def count_bars(block):
+    """ Rough number of measures in a staff block: number of bar runs on the first string.
+    """
+    return len(re.findall(r'[|+]+', block[1])) if len(block) > 1 else 0
+
+
+def add_string(block):
+    """ Turn a 4-string staff block into a 5-string one, with an empty low B string.
+    """
+    low = ''.join(c if c in '|+*' else '-' for c in block[-1])
+    return block + [low]
+
+
+def spread_block(block, extra):
+    """ Widen a staff block: each blank column (dashes under an empty header) is followed
+        by extra more ones, as in tabs spaced out for readability.
+    """
+    width = max(len(line) for line in block)
+    block = [line.ljust(width) for line in block]
+    fills = [' '] + ['-'] * (len(block) - 1)
+    columns = []
+    for index in range(width):
+        column = [line[index] for line in block]
+        columns.append(column)
+        if column[0] == ' ' and all(c == '-' for c in column[1:]):
+            columns.extend([fills] * extra)
+    return [''.join(column[row] for column in columns) for row in range(len(block))]
+
+
+def synthetic_tab(nb_measures, nb_strings=4, source=None, spread=0):
+    """ Build a tablature of about nb_measures measures by cycling the staff blocks
+        of the corpus files, optionally spread out (see spread_block).
+    """
+    header = None
+    blocks = []
+    for file_name in ([source] if source else corpus_files()):
+        file_header, file_blocks = split_tab(Path(file_name).read_text())
+        header = header or file_header
+        blocks.extend(b for b in file_blocks if len(b) == 5)
+    if nb_strings == 5:
+        blocks = [add_string(b) for b in blocks]
+    if spread:
+        blocks = [spread_block(b, spread) for b in blocks]
+    lines = list(header)
+    measures = 0
+    for block in cycle(blocks):
+        if measures >= nb_measures:
+            break
+        lines.extend(block)
+        lines.append('')
+        measures += count_bars(block)
+    lines.append('end')
+    return '\n'.join(lines) + '\n'
+
+
+class ReplayTokenizer:
+    """ Tokenizer giving back recorded tokens, to time the parser alone.
+    """
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+
+    def get_next_token(self):
+        return next(self.tokens)
@@ -0,0 +1,37 @@
+import importlib
+import io
+import logging
+from btab2mxml.btab.btab_reader import BtabTextReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+
+
+def convert(source, output=None, writer='music21'):
+    """ Convert a tablature held in memory: a str, a file-like object (text or binary)
+        or an iterable of lines.
+        Return the MusicXML document as bytes or, if output (a writable binary or text
+        object) is given, write it there and return None.
+        writer is 'music21', 'direct' or 'stream' (direct, written measure by measure).
+    """
+    # Imported here: music21 is only needed once a score has to be built
+    from btab2mxml.btab.btab_parser import BtabParser
+
+    parser = BtabParser(BtabTokenizer(BtabTextReader(source)))
+    buffer = io.BytesIO() if output is None else output
+    if writer == 'stream':
+        parser.parse_streaming(buffer)
+    else:
+        parser.parse()
+        parser.output(buffer, writer=writer)
+    return buffer.getvalue() if output is None else None
+
+
+def init_worker():
+    """ Initializer of worker processes running convert().
+    """
+    logger = logging.getLogger()
+    # Handlers inherited from the parent would write concurrently to the same outputs
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    # Pay the music21 import once per worker, not on the first conversion
+    importlib.import_module('btab2mxml.btab.btab_parser')
+    importlib.import_module('music21.musicxml.m21ToXml')
@@ -0,0 +1,59 @@
+""" asyncio conversion API.
+
+    The parse and export, CPU bound, run in worker processes (or any given executor),
+    at most max_concurrency at a time; files are read and written in threads, so that
+    the event loop is never blocked:
+
+        async with AsyncConverter(max_concurrency=4) as converter:
+            xml = await converter.convert(text)
+            results = await converter.convert_files([(in_file, out_file), ...])
+
+    Cancelling a conversion cancels it while it waits for a slot or an executor worker;
+    a conversion already running in a worker process completes, and its result is dropped.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import os
+from pathlib import Path
+from btab2mxml.api import convert, init_worker
+
+
+class AsyncConverter:
+    def __init__(self, max_concurrency=None, executor=None):
+        self.max_concurrency = max_concurrency or os.cpu_count()
+        self.own_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=self.max_concurrency, initializer=init_worker)
+        self.executor = executor
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.own_executor:
+            await asyncio.to_thread(self.executor.shutdown, True, cancel_futures=True)
+
+    async def convert(self, text, writer='music21'):
+        """ Convert the text of a tablature, return the MusicXML document as bytes.
+        """
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, convert, text, None, writer)
+
+    async def convert_file(self, in_file, out_file, writer='music21'):
+        """ Convert the tablature file in_file into the MusicXML file out_file.
+        """
+        text = await asyncio.to_thread(Path(in_file).read_text, encoding='utf-8')
+        xml = await self.convert(text, writer)
+        await asyncio.to_thread(Path(out_file).write_bytes, xml)
+
+    async def convert_files(self, jobs, writer='music21'):
+        """ Convert the (in_file, out_file) jobs concurrently.
+            Return, for each job, None or the exception raised by its conversion.
+        """
+        return await asyncio.gather(*(self.convert_file(in_file, out_file, writer)
+                                      for in_file, out_file in jobs), return_exceptions=True)
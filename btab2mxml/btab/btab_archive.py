@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+import mmap
+import re
+
+
+@dataclass(slots=True)
+class ArchiveSong:
+    """ A song of an archive: bytes [start, stop) of the file, starting after first_line lines.
+    """
+    title: str
+    start: int
+    stop: int
+    first_line: int = 0
+
+    def get_file_stem(self, archive_stem):
+        slug = re.sub(r'[^a-z0-9]+', '_', (self.title or '').lower()).strip('_')
+        return f'{archive_stem}-{slug}' if slug else archive_stem
+
+
+def index_archive(file_name, encoding='utf-8'):
+    """ Scan once a file of concatenated tablatures, and return the list of its songs.
+
+        A song starts with its title line: 'Rush: <title>', or '<title>' followed by a
+        'By Rush' line (the title lines recognized by BtabTokenizer and BtabParser), once
+        the staff lines of the previous song have started. A song ends where the next
+        one starts: what follows its end of score marker is ignored by the tokenizer.
+    """
+    songs = []
+    with open(file_name, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file: cannot be mapped
+            return songs
+    with data:
+        size = len(data)
+        pos = 0
+        in_score = False
+        line_number = 0
+        # Offset, content and number of the last non empty header line
+        last_line = (0, b'', 0)
+        while pos < size:
+            end = data.find(b'\n', pos)
+            if end < 0:
+                end = size
+            line = data[pos:end].rstrip(b'\r')
+            if line[:1] == b' ':
+                in_score = True
+            elif b'Rush:' in line or (line.strip() == b'By Rush' and last_line[1]):
+                if b'Rush:' in line:
+                    start, title, first_line = pos, line.decode(encoding).replace('Rush: ', ''), line_number
+                else:
+                    start, title, first_line = last_line[0], last_line[1].decode(encoding).strip(), last_line[2]
+                if not songs:
+                    # What comes before the first title belongs to the first song,
+                    #   unless it is a song of its own
+                    if in_score:
+                        songs.append(ArchiveSong(None, 0, start))
+                        songs.append(ArchiveSong(title, start, size, first_line))
+                    else:
+                        songs.append(ArchiveSong(title, 0, size))
+                elif in_score:
+                    songs[-1].stop = start
+                    songs.append(ArchiveSong(title, start, size, first_line))
+                else:
+                    # Another title line in the same header
+                    songs[-1].title = title
+                in_score = False
+            if line and line[:1] != b' ':
+                last_line = (pos, line, line_number)
+            pos = end + 1
+            line_number += 1
+        if not songs and size > 0:
+            songs.append(ArchiveSong(None, 0, size))
+    return songs
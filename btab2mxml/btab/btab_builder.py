@@ -0,0 +1,369 @@
+""" Semantic pass over the tokens of a tablature, shared by BtabParser (music21 score) and
+    IrBuilder (IR): the rules applied to each token live here, the objects built from them
+    are created by the hooks of the subclasses.
+"""
+from abc import ABC, abstractmethod
+import logging
+from btab2mxml.btab.token import *
+from btab2mxml.ir import ir
+
+class BtabBuilder_InvalidDurationException(Exception):pass
+class BtabBuilder_InvalidPitchException(Exception):pass
+
+
+class BtabBuilder(ABC):
+    def __init__(self, tokenizer, profiler=None):
+        self.tokenizer = tokenizer
+        # Optional btab2mxml.profiling.Profiler recording the handling of each token
+        self.profiler = profiler
+        self.nb_strings = 0
+        self.current_measure = None
+        self.repeated_measure = None
+        self.measure_nb = 1
+        self.empty_measure = True
+        # Default time signature
+        self.current_time_signature = None
+        # Running length of the current measure, and length of the current note in it, in ticks
+        self.measure_ticks = 0
+        self.note_ticks = 0
+        self.current_note = None
+        # Last notes which got a tie and a triplet
+        self.tied_note = None
+        self.triplet_note = None
+        self.glissando = None
+        # (note the slur starts from, 'h' or 'p')
+        self.expression = None
+        self.last_header_token = ''
+
+    def _read_tokens(self):
+        token = self.tokenizer.get_next_token()
+        # Skip header
+        while isinstance(token, HeaderLineToken):
+            self._handle_header_token(token)
+            token = self.tokenizer.get_next_token()
+        while not isinstance(token, NbStringsToken) and not isinstance(token, EndToken):
+            token = self.tokenizer.get_next_token()
+        self.nb_strings = token.get_value()
+        self._start_song()
+        if self.profiler is not None:
+            while not isinstance(token, EndToken):
+                with self.profiler.token(token):
+                    self._handle_token(token)
+                token = self.tokenizer.get_next_token()
+        while not isinstance(token, EndToken):
+            self._handle_token(token)
+            token = self.tokenizer.get_next_token()
+
+    def _handle_header_token(self, token):
+        if isinstance(token, CopyrightToken):
+            self._set_copyright(f'Translation copyright: {token.get_value()}')
+        elif isinstance(token, TitleToken):
+            self._set_title(token.get_value())
+        elif (len(self.last_header_token) > 0) and token.get_value() == 'By Rush':
+            self._set_title(self.last_header_token.strip())
+        else:
+            self.last_header_token = token.get_value()
+
+    def _handle_token(self, token):
+        handler = self.token_handlers.get(token.__class__)
+        if handler is None:
+            handler = self._find_token_handler(token.__class__)
+        if handler is not None:
+            handler(self, token)
+
+    @classmethod
+    def _find_token_handler(cls, token_class):
+        """ Handler of the closest registered base class of token_class, if any.
+        """
+        for base in token_class.__mro__[1:]:
+            if base in cls.token_handlers:
+                return cls.token_handlers[base]
+        return None
+
+    @classmethod
+    def register_token_handler(cls, token_class, handler):
+        """ Handle the tokens of token_class (and of its subclasses having no handler of
+            their own) with handler(builder, token), in place of the current handler if any.
+            Registering on a subclass leaves the handlers of its base classes untouched.
+        """
+        if 'token_handlers' not in cls.__dict__:
+            cls.token_handlers = dict(cls.token_handlers)
+        cls.token_handlers[token_class] = handler
+
+    def _handle_measure_bar(self, token):
+        if self.current_measure is not None and not self.empty_measure:
+            if self.current_time_signature is None:
+                self.current_time_signature = '4/4'
+                self._set_time_signature(self.current_measure, self.current_time_signature, False)
+            self._check_measure_duration()
+            self._add_measure()
+        self.current_measure = self._new_measure(self.measure_nb)
+        self.measure_ticks = self.note_ticks = 0
+
+    def _handle_start_repetition(self, token):
+        if self._has_measure(token):
+            self._set_repeat_start(self.current_measure)
+
+    def _handle_end_repetition(self, token):
+        if self._has_measure(token):
+            self._set_repeat_end(self.current_measure)
+            self.repeated_measure = self.current_measure
+
+    def _handle_repetition_number(self, token):
+        if self.repeated_measure is None:
+            self._report(logging.ERROR, 'repetition-number', f'Repetition number without repetition (measure {self.measure_nb})')
+        else:
+            self._add_repeat_count(self.repeated_measure, token.get_value())
+            self.repeated_measure = None
+
+    def _handle_time_signature(self, token):
+        self.current_time_signature = token.get_value()
+        if self.current_measure is not None:
+            self._set_time_signature(self.current_measure, self.current_time_signature, True)
+
+    def _handle_note(self, token):
+        if not self._check_duration(token, token.duration):
+            return
+        frets = [(string, fret) for string, fret in enumerate(token.frets) if fret is not None]
+        try:
+            if len(frets) == 0:
+                raise BtabBuilder_InvalidPitchException
+            pitches = [self._get_pitch(string, fret) for string, fret in frets]
+        except BtabBuilder_InvalidPitchException:
+            self._report(logging.ERROR, 'invalid-pitch', f'Invalid pitch: {token.get_value()}')
+            pitches = [self._default_pitch()]
+        if not self._has_measure(token):
+            return
+        self.current_note = self._make_note(token.duration, pitches)
+        if self.glissando is not None:
+            self._add_glissando(self.glissando, self.current_note)
+            self.glissando = None
+        self._append_note(self.current_note)
+        self._add_ticks(token.duration)
+        if self.expression is not None:
+            self._add_slur(*self.expression, self.current_note)
+            self.expression = None
+        self.empty_measure = False
+
+    def _handle_tie(self, token):
+        if self.current_note is not None:
+            self._set_tie(self.current_note)
+            self.tied_note = self.current_note
+
+    def _handle_tied_note(self, token):
+        if self.current_note is None or self.current_note is not self.tied_note:
+            self._report(logging.ERROR, 'dangling-tie', f'continued note (measure {self.measure_nb})')
+        elif self._check_duration(token, token.get_value()):
+            note = self._make_tied_note(self.current_note, token.get_value())
+            if note is not None:
+                self.current_note = note
+                self._append_note(self.current_note)
+                self._add_ticks(token.get_value())
+                self.empty_measure = False
+
+    def _handle_rest(self, token):
+        if self._check_duration(token, token.get_value()) and self._has_measure(token):
+            self.current_note = self._make_rest(token.get_value())
+            self._append_note(self.current_note)
+            self._add_ticks(token.get_value())
+            self.empty_measure = False
+
+    def _handle_long_rest(self, token):
+        if self.current_measure is None:
+            # Happens that a multi-measure rest is at beginning, without measure bar
+            #   so current_measure may not be created
+            self.current_measure = self._new_measure(self.measure_nb)
+            self.measure_nb += 1
+        self._set_repeat_start(self.current_measure)
+        for code in ir.measure_rest_codes(self.current_time_signature or '4/4'):
+            self._append_note(self._make_rest(code))
+        self._add_repeat_count(self.current_measure, token.get_value())
+        self._set_repeat_end(self.current_measure)
+        self._add_measure()
+        self.current_measure = self._new_measure(self.measure_nb)
+
+    def _handle_triolet(self, token):
+        if self.current_note is None:
+            return
+        if self.current_note is self.triplet_note:
+            self._report(logging.WARNING, 'triplet', f'Note already in a triplet (measure {self.measure_nb})')
+            return
+        self._set_triplet(self.current_note)
+        self.triplet_note = self.current_note
+        triplet = ir.triplet_ticks(self.note_ticks)
+        self.measure_ticks -= self.note_ticks - triplet
+        self.note_ticks = triplet
+
+    def _handle_glissando(self, token):
+        self.glissando = self.current_note
+
+    def _handle_bend(self, token):
+        if self.current_note is not None:
+            self._add_bend(self.current_note)
+
+    def _handle_nb_strings(self, token):
+        self.nb_strings = token.get_value()
+
+    def _handle_hammer_on(self, token):
+        if self.current_note is not None:
+            self.expression = (self.current_note, 'h')
+
+    def _handle_pull_off(self, token):
+        if self.current_note is not None:
+            self.expression = (self.current_note, 'p')
+
+    def _report(self, level, code, message):
+        """ Report a problem of the tablature; code identifies its kind (e.g. 'invalid-pitch').
+        """
+        logging.log(level, message)
+
+    def _has_measure(self, token):
+        if self.current_measure is None:
+            self._report(logging.ERROR, 'no-measure', f'{token.__class__.__name__} before the first measure bar')
+            return False
+        return True
+
+    def _check_duration(self, token, duration_str):
+        if duration_str not in ir.notes_duration:
+            self._report(logging.ERROR, 'invalid-duration', f'Invalid duration: {token.get_value()}')
+            return False
+        return True
+
+    def _check_measure_duration(self):
+        if self.measure_ticks != ir.time_signature_ticks(self.current_time_signature):
+            self._report(logging.WARNING, 'measure-duration',
+                         f'Duration of measure {self.measure_nb}: {ir.quarter_length(self.measure_ticks)},'
+                         f' time signature is {self.current_time_signature}')
+
+    def _add_measure(self):
+        self._append_measure(self.current_measure)
+        self.current_measure = self._new_measure(self.measure_nb)
+        self.measure_ticks = self.note_ticks = 0
+        self.empty_measure = True
+        logging.debug(f'btab_builder: add measure {self.measure_nb}')
+        self.measure_nb += 1
+
+    def _add_ticks(self, duration_str):
+        """ Account for the current note, of duration code duration_str, just appended to the measure.
+        """
+        self.note_ticks = ir.notes_duration[duration_str][2]
+        self.measure_ticks += self.note_ticks
+
+    def _get_pitch(self, string, fret):
+        if fret == GHOST:
+            return self._make_pitch(string, 0, True)
+        if isinstance(fret, int):
+            return self._make_pitch(string, fret, False)
+        if '(' in fret and fret.replace('(', '').replace(')', '').isdigit():
+            logging.info('Appoggiatura not supported')
+        raise BtabBuilder_InvalidPitchException
+
+    # Hooks building the objects of the subclass
+
+    def _start_song(self):
+        """ Called once the header is read and the number of strings known.
+        """
+
+    @abstractmethod
+    def _set_title(self, title):
+        pass
+
+    @abstractmethod
+    def _set_copyright(self, copyright):
+        pass
+
+    @abstractmethod
+    def _new_measure(self, number):
+        pass
+
+    @abstractmethod
+    def _append_measure(self, measure):
+        """ Add the closed measure to the song.
+        """
+
+    @abstractmethod
+    def _set_time_signature(self, measure, time_signature, explicit):
+        pass
+
+    @abstractmethod
+    def _set_repeat_start(self, measure):
+        pass
+
+    @abstractmethod
+    def _set_repeat_end(self, measure):
+        pass
+
+    @abstractmethod
+    def _add_repeat_count(self, measure, count):
+        pass
+
+    @abstractmethod
+    def _make_pitch(self, string, fret, ghost):
+        pass
+
+    @abstractmethod
+    def _default_pitch(self):
+        """ Pitch used in place of an invalid one.
+        """
+
+    @abstractmethod
+    def _make_note(self, duration_str, pitches):
+        """ Note, or chord if there are several pitches.
+        """
+
+    @abstractmethod
+    def _make_tied_note(self, note, duration_str):
+        """ Continuation of note (a note, chord or rest), or None if it cannot be continued.
+        """
+
+    @abstractmethod
+    def _make_rest(self, duration_str):
+        pass
+
+    @abstractmethod
+    def _append_note(self, note):
+        """ Add note to the current measure.
+        """
+
+    @abstractmethod
+    def _set_tie(self, note):
+        pass
+
+    @abstractmethod
+    def _set_triplet(self, note):
+        pass
+
+    @abstractmethod
+    def _add_glissando(self, note_from, note_to):
+        """ Called before note_to is appended to the measure.
+        """
+
+    @abstractmethod
+    def _add_slur(self, note_from, text, note_to):
+        """ Hammer-on ('h') or pull-off ('p') slur, called after note_to is appended to the measure.
+        """
+
+    @abstractmethod
+    def _add_bend(self, note):
+        pass
+
+    # Token class -> handler(builder, token); tokens of other classes are ignored
+    token_handlers = {
+        MeasureBarToken: _handle_measure_bar,
+        StartRepetitionToken: _handle_start_repetition,
+        EndRepetitionToken: _handle_end_repetition,
+        RepetionNumberToken: _handle_repetition_number,
+        TimeSignatureToken: _handle_time_signature,
+        NoteToken: _handle_note,
+        TieToken: _handle_tie,
+        TiedNoteToken: _handle_tied_note,
+        RestToken: _handle_rest,
+        LongRestToken: _handle_long_rest,
+        TrioletToken: _handle_triolet,
+        GlissDownToken: _handle_glissando,
+        GlissUpToken: _handle_glissando,
+        BendToken: _handle_bend,
+        NbStringsToken: _handle_nb_strings,
+        HammerOnToken: _handle_hammer_on,
+        PullOffToken: _handle_pull_off,
+    }
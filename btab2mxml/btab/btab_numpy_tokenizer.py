@@ -0,0 +1,87 @@
+""" Optional NumPy backend of the tokenizer.
+
+    Each staff block of the reader is loaded once into a uint8 array (rows x columns), where
+    a vectorized mask finds the blank columns (dashes under an empty header). The tokenizer
+    reads them one by one to do nothing; runs of them are skipped at once. The other columns
+    are classified by the column table of BtabTokenizer. The tokens are the ones of
+    BtabTokenizer, which stays the reference.
+    Experimental: on ordinary tabs it is no faster than BtabTokenizer, so the command line
+    does not offer it (see benchmarks/bench_tokenizers.py).
+"""
+import logging
+from btab2mxml.btab.btab_reader import BtabBlockReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.token import EndToken
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def get_blank_columns(grid, nb_strings):
+    """ Return the mask of the blank columns of the grid: dashes on the strings (the last
+        nb_strings rows) under an empty header (the row above them).
+    """
+    if grid.shape[0] <= nb_strings:
+        # Strings without header: the columns are not the ones of a staff
+        return numpy.zeros(grid.shape[1], dtype=bool)
+    dashes = (grid[-nb_strings:] == ord('-')).all(axis=0)
+    header = grid[-(nb_strings + 1)]
+    # Other headers str.strip() would empty (e.g. tabs) are taken as not blank: their columns are just read
+    return dashes & (header == ord(' '))
+
+
+def get_skip_targets(blank):
+    """ For each column, the first column from it which is not blank.
+    """
+    nb_columns = len(blank)
+    targets = numpy.where(blank, nb_columns, numpy.arange(nb_columns))
+    return numpy.minimum.accumulate(targets[::-1])[::-1]
+
+
+class BtabNumpyTokenizer(BtabTokenizer):
+    """ Tokenizer skipping the blank columns of each staff block, found with NumPy.
+        Readers other than BtabBlockReader ones are read column by column, as BtabTokenizer does.
+    """
+    def __init__(self, reader):
+        if numpy is None:
+            raise ImportError('BtabNumpyTokenizer requires numpy')
+        super().__init__(reader)
+        self.vectorized = isinstance(reader, BtabBlockReader)
+        self.grid_block = None
+        self.skip_targets = None
+
+    def _load_block(self):
+        reader = self.reader
+        self.grid_block = reader.block
+        # One byte per character: non ASCII characters (never part of a staff symbol) become '?'
+        grid = numpy.frombuffer(reader.block.encode('ascii', 'replace'), dtype=numpy.uint8)
+        grid = grid.reshape(len(reader.staff_lines), reader.staff_line_length)
+        self.skip_targets = get_skip_targets(get_blank_columns(grid, self.nb_strings)).tolist()
+
+    def _get_next_symbol(self):
+        # Same as BtabTokenizer._get_next_symbol, one call less per column
+        if self.symbol_buffer:
+            return self.symbol_buffer.popleft()
+        reader = self.reader
+        if not self.frets_buffer and self.vectorized and reader.staff_line_index < reader.staff_line_length:
+            # A blank column with no pending note would only flush an empty note
+            if reader.block is not self.grid_block:
+                self._load_block()
+            reader.staff_line_index = self.skip_targets[reader.staff_line_index]
+        symbol = reader.get_next_score_symbol()
+        if reader.is_eof():
+            return self.token_buffer.append(EndToken())
+        return symbol
+
+
+def create_tokenizer(reader, backend='python'):
+    """ Return the tokenizer of the backend ('python' or 'numpy') reading reader.
+        Falls back to the pure Python tokenizer when numpy is not installed.
+    """
+    if backend == 'numpy':
+        if numpy is not None:
+            return BtabNumpyTokenizer(reader)
+        logging.warning('numpy is not installed, using the pure Python tokenizer')
+    return BtabTokenizer(reader)
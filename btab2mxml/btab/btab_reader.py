@@ -1,4 +1,6 @@
+import io
 import logging
+import mmap
 
 class BtabReaderBadReadModeException(Exception):
     pass
@@ -6,45 +8,60 @@ class BtabReaderBadReadModeException(Exception):
 
 class BtabReader:
     def __init__(self, input_file_name):
-        self.read_index = 0
         self.input_file = open(input_file_name)
+        self._init_buffers()
+
+    def _init_buffers(self):
+        self.read_index = 0
         self.end_of_file = False
         self.buffer = ''
         self.staff_line_index = 0
         self.staff_line_length = 0
         self.staff_lines = [[]]
         self.line_nb = 1
+        # Number of the last line read from the input, and of the first line of the staff block
+        self.lines_read = 0
+        self.block_line = 0
 
     def read_line(self):
         if len(self.buffer) == 0:
             self.buffer = self.input_file.readline()
+            self.lines_read += 1
         if self.buffer is None:
             self.end_of_file = True
             return ''
         self.buffer = self.buffer.replace('\n', '')
-        logging.debug(f'btab_reader: read line nb {self.line_nb}')
+        logging.debug('btab_reader: read line nb %d', self.line_nb)
         self.line_nb += 1
         return self.buffer
 
     def consume_line(self):
         self.buffer = ''
 
+    def _read_staff_block(self):
+        """ Read the lines of the next staff block, up to an empty line.
+            Return an empty list at end of score.
+        """
+        staff_lines = []
+        line = ''
+        while len(line) == 0 and not self.end_of_file:
+            line = self.read_line().replace('\n', '')
+            self.consume_line()
+        self.block_line = self.lines_read
+        while line:
+            if (line == 'end') or ((len(line) > 0) and (line[0] == '=')):
+                # End of score
+                line = None
+            else:
+                staff_lines.append(line)
+                line = self.read_line()
+                self.consume_line()
+        return staff_lines
+
     def get_next_score_symbol(self):
         if self.staff_line_index == self.staff_line_length:
             # Buffer entirely read --> refill
-            self.staff_lines = []
-            line = ''
-            while len(line) == 0:
-                line = self.read_line().replace('\n', '')
-                self.consume_line()
-            while line:
-                if (line == 'end') or ((len(line) > 0) and (line[0] == '=')):
-                    # End of score
-                    line = None
-                else:
-                    self.staff_lines.append(line)
-                    line = self.read_line()
-                    self.consume_line()
+            self.staff_lines = self._read_staff_block()
             if len(self.staff_lines) > 0:
                 lines_length = max([len(line) for line in self.staff_lines])
                 # Adjust lines length
@@ -61,3 +78,153 @@ class BtabReader:
 
     def is_eof(self):
         return self.end_of_file
+
+    def get_position(self):
+        """ Return the (line, column) of the last score symbol read, both starting at 1:
+            the first line of its staff block, and its column.
+        """
+        return self.block_line, self.staff_line_index
+
+
+class BtabBlockReader(BtabReader):
+    """ Reader keeping each staff block as one padded buffer, row after row.
+        A column is then a strided slice of the buffer, with no intermediate list.
+    """
+    def _init_buffers(self):
+        super()._init_buffers()
+        self.block = ''
+
+    def get_next_score_symbol(self):
+        if self.staff_line_index == self.staff_line_length:
+            # Buffer entirely read --> refill
+            self.staff_lines = self._read_staff_block()
+            if len(self.staff_lines) > 0:
+                lines_length = max([len(line) for line in self.staff_lines])
+                self.block = ''.join([line.ljust(lines_length, ' ') for line in self.staff_lines])
+                self.staff_line_length = lines_length
+            self.staff_line_number = len(self.staff_lines)
+            self.staff_line_index = 0
+        if self.staff_line_length == 0 or len(self.staff_lines) == 0:
+            # End of score
+            return None
+        symbol = self.block[self.staff_line_index::self.staff_line_length]
+        self.staff_line_index += 1
+        return symbol
+
+
+class BtabMmapReader(BtabBlockReader):
+    """ Reader memory-mapping the file: lines and staff blocks are found with bytes
+        operations, and only the lines handed out are decoded (one decode per staff block).
+        Unlike BtabReader, the end of file is detected, even without end of score marker.
+        With start and stop, only these bytes of the file are read (e.g. a song of an archive):
+        first_line is then the number of lines before start, for the line numbers of the positions.
+        Without use_mmap, the file is read into memory instead (e.g. a file which may be
+        truncated while it is read: accessing a truncated mapping raises SIGBUS).
+        The reader is a context manager closing the mapping.
+    """
+    def __init__(self, input_file_name, encoding='utf-8', start=0, stop=None, first_line=0, use_mmap=True):
+        self.encoding = encoding
+        with open(input_file_name, 'rb') as f:
+            if not use_mmap:
+                self.data = f.read()
+            else:
+                try:
+                    self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # Empty file: cannot be mapped
+                    self.data = b''
+        self.size = len(self.data) if stop is None else min(stop, len(self.data))
+        self.pos = start
+        self._init_buffers()
+        self.lines_read = first_line
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _next_line_end(self):
+        """ Return the end of the line starting at pos (excluding the new line).
+        """
+        end = self.data.find(b'\n', self.pos, self.size)
+        return self.size if end < 0 else end
+
+    def read_line(self):
+        if len(self.buffer) == 0:
+            if self.pos >= self.size:
+                self.end_of_file = True
+                return ''
+            end = self._next_line_end()
+            self.buffer = self.data[self.pos:end].decode(self.encoding).rstrip('\r')
+            self.pos = end + 1
+            self.lines_read += 1
+        logging.debug('btab_reader: read line nb %d', self.line_nb)
+        self.line_nb += 1
+        return self.buffer
+
+    def _read_staff_block(self):
+        staff_lines = []
+        if len(self.buffer) > 0:
+            # Line read but not consumed yet (first staff line, read by the tokenizer header state)
+            line = self.buffer
+            self.consume_line()
+            if line == 'end' or line[0] == '=':
+                return staff_lines
+            staff_lines.append(line)
+            self.block_line = self.lines_read
+        data = self.data
+        if not staff_lines:
+            # Skip empty lines
+            while self.pos < self.size and data[self.pos:self.pos + 1] in (b'\n', b'\r'):
+                if data[self.pos:self.pos + 1] == b'\n':
+                    self.lines_read += 1
+                self.pos += 1
+            if self.pos >= self.size:
+                self.end_of_file = True
+                return staff_lines
+            self.block_line = self.lines_read + 1
+        start = self.pos
+        stop = start
+        while self.pos < self.size:
+            end = self._next_line_end()
+            line = data[self.pos:end].rstrip(b'\r')
+            self.pos = end + 1
+            self.line_nb += 1
+            self.lines_read += 1
+            if len(line) == 0 or line == b'end' or line[:1] == b'=':
+                break
+            stop = end
+        if stop > start:
+            staff_lines.extend(line.rstrip('\r') for line in data[start:stop].decode(self.encoding).split('\n'))
+        return staff_lines
+
+
+class BtabTextReader(BtabBlockReader):
+    """ Reader of a tablature in memory: a str, a file-like object (text or binary)
+        or an iterable of lines. The end of input is detected, even without end of score marker.
+    """
+    def __init__(self, source, encoding='utf-8'):
+        if isinstance(source, str):
+            source = io.StringIO(source)
+        self.lines = iter(source)
+        self.encoding = encoding
+        self._init_buffers()
+
+    def read_line(self):
+        if len(self.buffer) == 0:
+            line = next(self.lines, None)
+            if line is None:
+                self.end_of_file = True
+                return ''
+            if isinstance(line, bytes):
+                line = line.decode(self.encoding)
+            self.buffer = line.rstrip('\r\n')
+            self.lines_read += 1
+        logging.debug('btab_reader: read line nb %d', self.line_nb)
+        self.line_nb += 1
+        return self.buffer
@@ -1,6 +1,18 @@
 import logging
+from collections import deque
 from btab2mxml.btab.token import *
 
+# Version of the token stream produced: to increase whenever the tokens of a tablature may change
+TOKENIZER_VERSION = 2
+
+# Classes of the columns of strings
+COLUMN_DASHES = 0
+COLUMN_BAR = 1
+COLUMN_TIME_SIGNATURE = 2
+COLUMN_REPEAT = 3
+COLUMN_PATH = 4
+COLUMN_FRETS = 5
+
 class BtabTokenizer:
     durations = 'wWhHqQeEsS'
     note_paths = {
@@ -12,17 +24,25 @@ class BtabTokenizer:
     '/': GlissUpToken,
     '^': BendToken,
     }
+    # Classification of the distinct columns of strings, per number of strings, shared by
+    #   the tokenizers (a subclass changing the classification rules needs its own table)
+    column_classes = {}
+    column_cache_size = 4096
 
     def __init__(self, reader):
         self.reader = reader
         self.current_state = self.header
-        self.symbol_buffer = []
-        self.token_buffer = []
+        self.symbol_buffer = deque()
+        self.token_buffer = deque()
         self.in_repetition = False
         self.nb_strings = 0
+        self.bar_symbols = ()
         self.frets_buffer = []
         self.header_buf = []
         self.fret_buf = []
+        self.columns = {}
+        self.column_hits = 0
+        self.column_misses = 0
 
     def get_next_token(self):
         """ Return and consume the next token.
@@ -30,18 +50,34 @@ class BtabTokenizer:
         token = None
         while token is None:
             if len(self.token_buffer) > 0:
-                token = self.token_buffer[0]
-                del(self.token_buffer[0])
+                token = self.token_buffer.popleft()
             else:
                 token = self.current_state()
 
-        logging.debug(f'btab_tokenizer: sending token {str(token)}')
+        logging.debug('btab_tokenizer: sending token %s', token)
         return token
 
+    def __iter__(self):
+        """ Stream the tokens, up to and including the EndToken.
+            Same sequence as successive get_next_token() calls, without polling.
+        """
+        token_buffer = self.token_buffer
+        while True:
+            while token_buffer:
+                token = token_buffer.popleft()
+                yield token
+                if isinstance(token, EndToken):
+                    return
+            token = self.current_state()
+            if token is not None:
+                yield token
+                if isinstance(token, EndToken):
+                    return
+
     def header(self):
         line = self.reader.read_line()
         if self.reader.is_eof():
-            return EndToken(line)
+            return EndToken()
         if len(line) > 0 and line[0] == ' ':
             self.current_state = self.count_strings
             return HeaderLineToken('')
@@ -62,6 +98,11 @@ class BtabTokenizer:
             self.symbol_buffer.append(symbol)
             if '|' in symbol or '+' in symbol:
                 self.nb_strings = symbol.count('|') + symbol.count('+')
+                # Plain, boxed ('+||+') and open ('-|||') measure bars
+                self.bar_symbols = ('|' * self.nb_strings,
+                                    '+' + '|' * (self.nb_strings - 2) + '+',
+                                    '-' + '|' * (self.nb_strings - 1))
+                self.columns = self.column_classes.setdefault(self.nb_strings, {})
                 self.token_buffer.append(NbStringsToken(self.nb_strings))
                 self.current_state = self.score
                 return
@@ -74,9 +115,38 @@ class BtabTokenizer:
         frets = symbol[1:]
         return (header, frets)
 
+    def _classify_column(self, strings):
+        """ Return the (class, path token class or None) of a column of strings,
+            and record it while the table is not full.
+        """
+        self.column_misses += 1
+        path = next((token_class for p, token_class in self.note_paths.items() if p in strings), None)
+        if strings == '-' * self.nb_strings:
+            column_class = COLUMN_DASHES
+        elif strings in self.bar_symbols:
+            column_class = COLUMN_BAR
+        elif '::' in strings:
+            column_class = COLUMN_TIME_SIGNATURE
+        elif '**' in strings:
+            column_class = COLUMN_REPEAT
+        elif path is not None:
+            column_class = COLUMN_PATH
+        else:
+            column_class = COLUMN_FRETS
+        if len(self.columns) < self.column_cache_size:
+            self.columns[strings] = (column_class, path)
+        return column_class, path
+
+    def column_cache_info(self):
+        """ Return the hits, misses and hit rate of the column classification table.
+        """
+        total = self.column_hits + self.column_misses
+        return {'hits': self.column_hits, 'misses': self.column_misses,
+                'hit_rate': self.column_hits / total if total else 0.0}
+
     def _consume_measure(self, header, frets):
         header_buf = header
-        self.symbol_buffer = []
+        self.symbol_buffer.clear()
         self.token_buffer.append(MeasureBarToken())
         end_symbol = False
         post_token = None
@@ -89,7 +159,7 @@ class BtabTokenizer:
             else:
                 header, frets = self._split_symbol(symbol)
                 header_buf += header
-                if (frets == '||||') or (frets == '+||+') or (frets == '-|||'):
+                if frets in self.bar_symbols:
                     end_symbol = False
                 elif (frets == '-' * self.nb_strings) and (len(header) == 0):
                     end_symbol = True
@@ -109,8 +179,7 @@ class BtabTokenizer:
     def _get_next_symbol(self):
         if len(self.symbol_buffer) > 0:
             # Treat postponed symbols
-            symbol = self.symbol_buffer[0]
-            del(self.symbol_buffer[0])
+            symbol = self.symbol_buffer.popleft()
         else:
             symbol = self.reader.get_next_score_symbol()
             if self.reader.is_eof():
@@ -130,7 +199,7 @@ class BtabTokenizer:
                 elif 'R' in value:
                     self.token_buffer.append(RestToken(self.frets_buffer))
                 else:
-                    self.token_buffer.append(NoteToken(value))
+                    self.token_buffer.append(NoteToken.from_symbols(value))
             self.frets_buffer = []
 
     def score(self):
@@ -142,30 +211,35 @@ class BtabTokenizer:
 
         symbol = symbol[-(self.nb_strings+1):]
         header, strings = self._split_symbol(symbol)
-        # Here I get the transition paths
-        paths = [p for p in BtabTokenizer.note_paths.keys() if p in strings]
+        column = self.columns.get(strings)
+        if column is None:
+            column = self._classify_column(strings)
+        else:
+            self.column_hits += 1
+        # Here I get the transition path
+        column_class, path = column
         trailer_token = None
         if header == '+':
             symbol = symbol.replace('+', ' ')
             # First consume the potential symbol bufferized
-            if (strings != '-' * self.nb_strings) and (len(paths) == 0):
+            if (column_class != COLUMN_DASHES) and (path is None):
                 self.frets_buffer.append(symbol)
                 # '+' is is considered as end of symbol, so force symbol treatment below
-                strings = '-' * self.nb_strings
+                column_class = COLUMN_DASHES
             header = ''
             # Then append the tie
-            trailer_token = TieToken('Tie')
+            trailer_token = TieToken()
         elif header == '^':
             symbol = symbol.replace('^', ' ')
             # First consume the potential symbol bufferized
-            if (strings != '-' * self.nb_strings) and (len(paths) == 0):
+            if (column_class != COLUMN_DASHES) and (path is None):
                 # Bufferize the content of symbol
                 self.frets_buffer.append(symbol)
                 # '^' is is considered as end of symbol, so force symbol treatment below
-                strings = '-' * self.nb_strings
+                column_class = COLUMN_DASHES
             header = ''
-            trailer_token = TrioletToken('Triolet')
-        if (strings == '-' * self.nb_strings):
+            trailer_token = TrioletToken()
+        if column_class == COLUMN_DASHES:
             if (len(header) == 0):
                 # Pure separator: end of "note"
                 self._send_symbol()
@@ -176,23 +250,23 @@ class BtabTokenizer:
             else:
                 # Just bufferize the symbol
                 self.frets_buffer.append(symbol)
-        elif (strings == '||||') or (strings == '+||+') or (strings == '-|||'):
+        elif column_class == COLUMN_BAR:
             self._send_symbol()
             self._consume_measure(header, strings)
-        elif '::' in strings:
+        elif column_class == COLUMN_TIME_SIGNATURE:
             if len(self.frets_buffer) == 0:
                 logging.error('Invalid time signature')
             self.token_buffer.append(TimeSignatureToken(self.frets_buffer))
             self.frets_buffer = []
-        elif '**' in strings:
+        elif column_class == COLUMN_REPEAT:
             self.token_buffer.append(EndRepetitionToken())
             self.frets_buffer.append(symbol)
             header = ''.join(s[0] for s in self.frets_buffer if s[0].isdigit())
             self._consume_measure(header, strings)
             self.frets_buffer = []
-        elif len(paths) > 0:
+        elif column_class == COLUMN_PATH:
             self._send_symbol()
-            self.token_buffer.append(BtabTokenizer.note_paths[paths[0]]())
+            self.token_buffer.append(path())
         else:
             self.frets_buffer.append(symbol)
         if trailer_token is not None:
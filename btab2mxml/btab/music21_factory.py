@@ -0,0 +1,103 @@
+""" Factories of the music21 objects built by BtabParser.
+
+    A tablature only uses a few duration codes, so their DurationTuples are built once, in
+    a bounded cache; clear_cache() drops them. Pitches are built by the MyPitch constructor:
+    copying a cached template and its mutable accidental and microtone is not faster.
+
+    The add_* functions build the notations of the score, for BtabParser and the IR lowering.
+"""
+from functools import lru_cache
+import music21
+from btab2mxml.ir import ir
+
+cache_size = 512
+
+
+class MyPitch(music21.pitch.Pitch):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ghost = False
+
+
+@lru_cache(maxsize=cache_size)
+def _duration_template(type_name, dots):
+    # DurationTuple is immutable: it can be shared by the durations
+    return music21.duration.durationTupleFromTypeDots(type_name, dots)
+
+
+def get_duration(type_name, dots=0):
+    """ Return a new music21 Duration.
+    """
+    return music21.duration.Duration(durationTuple=_duration_template(type_name, dots))
+
+
+def get_pitch(string, fret, ghost=False):
+    """ Return a new MyPitch for the fret of the string (0 = highest string).
+    """
+    pitch = MyPitch(ps=float(ir.string_pitches[string] + fret))
+    pitch.ghost = ghost
+    return pitch
+
+
+def get_note(pitches, duration, ghosts=()):
+    """ Return a new Note, or Chord if there are several pitches, with a cross notehead for
+        each pitch flagged in ghosts.
+    """
+    if len(pitches) > 1:
+        note = music21.chord.Chord(pitches, duration=duration)
+        for chord_note, ghost in zip(note.notes, ghosts):
+            if ghost:
+                chord_note.notehead = 'x'
+    else:
+        note = music21.note.Note(pitch=pitches[0], duration=duration)
+        if ghosts and ghosts[0]:
+            note.notehead = 'x'
+    return note
+
+
+def add_glissando(measure, note_from, note_to):
+    """ Add the slide from note_from to note_to, before note_to is appended to measure.
+    """
+    glissando = music21.spanner.Glissando([note_from, note_to])
+    glissando.lineType = 'solid'
+    glissando.label = ''
+    glissando.slideType = 'continuous'
+    measure.append(glissando)
+
+
+def add_slur(measure, note_from, note_to, text):
+    """ Add the hammer-on ('h') or pull-off ('p') from note_from to note_to, appended to measure.
+    """
+    measure.insert(music21.spanner.Slur([note_from, note_to]))
+    technique = music21.articulations.HammerOn if text == 'h' else music21.articulations.PullOff
+    measure.insert(technique([note_from, note_to]))
+    expression = music21.expressions.TextExpression(text)
+    expression.style.alignHorizontal = 'center'
+    expression.placement = 'above'
+    expression.style.defaultY = 100
+    expression.style.fontSize = 8
+    expression.style.fontStyle = 'italic'
+    measure.insert(note_to.offset, expression)
+
+
+def add_bend(measure, note):
+    bend = music21.expressions.TextExpression('~')
+    bend.placement = 'above'
+    measure.insert(note.offset, bend)
+
+
+def add_repeat_count(measure, count):
+    """ Add the number of repetitions at the end of measure.
+    """
+    repeat_text = music21.expressions.TextExpression(f'{count}x')
+    repeat_text.style.alignHorizontal = 'center'
+    repeat_text.placement = 'above'
+    measure.insert(measure.highestTime, repeat_text)
+
+
+def clear_cache():
+    _duration_template.cache_clear()
+
+
+def cache_info():
+    return {'durations': _duration_template.cache_info()}
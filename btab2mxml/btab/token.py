@@ -1,6 +1,5 @@
-import music21
-
 class Token:
+    __slots__ = ('value',)
     default_value = ''
     def __init__(self, value=None):
         self.value = value
@@ -10,31 +9,96 @@ class Token:
             return self.default_value
         else:
             return self.value
-    
+
     def __str__(self):
         return f'{self.__class__.__name__} {str(self.get_value())}'
 
-class EndToken(Token):    default_value = 'End'
-class HeaderLineToken(Token):  pass
-class TitleToken(HeaderLineToken): pass
-class CopyrightToken(HeaderLineToken): pass
-class NoteToken(Token):pass
-class TiedNoteToken(Token): pass
+class SingletonToken(Token):
+    """ Token without value: each class has a single, interned instance.
+    """
+    __slots__ = ()
+    instances = {}
+
+    def __new__(cls, value=None):
+        instance = SingletonToken.instances.get(cls)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance.value = None
+            SingletonToken.instances[cls] = instance
+        return instance
+
+    def __init__(self, value=None):
+        pass
+
+# Fret of a ghost (muted) note
+GHOST = -1
+
+def _get_fret(symbol):
+    if symbol == '':
+        return None
+    if symbol == 'x':
+        return GHOST
+    try:
+        return int(symbol)
+    except ValueError:
+        # Unsupported (e.g. appoggiatura '(5)') or invalid: kept for the error messages
+        return symbol
+
+class EndToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'End'
+class HeaderLineToken(Token):
+    __slots__ = ()
+class TitleToken(HeaderLineToken):
+    __slots__ = ()
+class CopyrightToken(HeaderLineToken):
+    __slots__ = ()
+class NoteToken(Token):
+    """ Note or chord: duration code (e.g. 'q') and, for each string from the highest one,
+        the fret played (int, GHOST) or None.
+    """
+    __slots__ = ('duration', 'frets')
+    def __init__(self, duration, frets):
+        self.duration = duration
+        self.frets = frets
+
+    @classmethod
+    def from_symbols(cls, symbols):
+        """ Build the token from the tablature strings: header, then one per string.
+        """
+        return cls(symbols[0][:1], tuple(_get_fret(s) for s in symbols[1:]))
+
+    def get_value(self):
+        return (self.duration, self.frets)
+class TiedNoteToken(Token):
+    __slots__ = ()
 class RestToken(Token):
+    __slots__ = ()
     def __init__(self, value):
         super().__init__()
         if len(value) == 1:
             self.value = value[0].strip()[0]
 class LongRestToken(Token):
+    __slots__ = ()
     def __init__(self, value):
         self.value = ''.join([v for v in value if v.isdigit()])
 
-class TrioletToken(Token):pass
-class MeasureBarToken(Token): default_value = 'Measure Bar'
-class StartRepetitionToken(Token): default_value = 'Start repetition'
-class EndRepetitionToken(Token): default_value = 'End repetition'
-class RepetionNumberToken(Token):pass
+class TrioletToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Triolet'
+class MeasureBarToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Measure Bar'
+class StartRepetitionToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Start repetition'
+class EndRepetitionToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'End repetition'
+class RepetionNumberToken(Token):
+    __slots__ = ()
 class TimeSignatureToken(Token):
+    __slots__ = ()
     def __init__(self, value):
         ts_string = [''.join(t[i] for t in value if t[i] != '-') for i in range(1, len(value[0]))]
         ts_string = [t for t in ts_string if len(t.strip()) > 0]
@@ -42,11 +106,24 @@ class TimeSignatureToken(Token):
 
     def get_value(self):
         return self.value
-    
-class NbStringsToken(Token): pass
-class TieToken(Token): default_value = 'Tie'
-class GlissDownToken(Token): default_value = 'Glissando'
-class HammerOnToken(Token): default_value = music21.articulations.HammerOn()
-class PullOffToken(Token): default_value = music21.articulations.PullOff()
-class GlissUpToken(Token): default_value = 'Glissando'
-class BendToken(Token): default_value = 'Bend'
+
+class NbStringsToken(Token):
+    __slots__ = ()
+class TieToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Tie'
+class GlissDownToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Glissando'
+class HammerOnToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Hammer-on'
+class PullOffToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Pull-off'
+class GlissUpToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Glissando'
+class BendToken(SingletonToken):
+    __slots__ = ()
+    default_value = 'Bend'
@@ -0,0 +1,273 @@
+""" Binary cache of the token stream of a tablature, to convert it again without reading
+    and tokenizing its text.
+
+    File layout: a header (magic, format version, tokenizer version, SHA-256 of the source),
+    then one record per token: the index of its class in token_classes, followed by its value.
+    Values are tagged: None, int or UTF-8 str (with a 1 or 4 byte length). A note token
+    stores its duration, then its frets on one byte each (escaped when not a small int).
+    A cache whose header does not match the source or the versions is ignored and rewritten.
+"""
+import hashlib
+import logging
+import os
+import struct
+from pathlib import Path
+from btab2mxml.btab.btab_numpy_tokenizer import create_tokenizer
+from btab2mxml.btab.btab_reader import BtabMmapReader
+from btab2mxml.btab.btab_tokenizer import TOKENIZER_VERSION
+from btab2mxml.btab.token import *
+
+MAGIC = b'BTOK'
+FORMAT_VERSION = 1
+header_struct = struct.Struct('<4sHH32s')
+
+# Record codes are the indexes in this tuple: only append to it (or increase FORMAT_VERSION)
+token_classes = (EndToken, HeaderLineToken, TitleToken, CopyrightToken, NoteToken, TiedNoteToken,
+                 RestToken, LongRestToken, TrioletToken, MeasureBarToken, StartRepetitionToken,
+                 EndRepetitionToken, RepetionNumberToken, TimeSignatureToken, NbStringsToken, TieToken,
+                 GlissDownToken, HammerOnToken, PullOffToken, GlissUpToken, BendToken)
+token_codes = {token_class: code for code, token_class in enumerate(token_classes)}
+singleton_classes = frozenset(c for c in token_classes if issubclass(c, SingletonToken))
+
+# Value tags
+VALUE_NONE = 0
+VALUE_INT = 1
+VALUE_STR = 2
+VALUE_SHORT_STR = 3
+# Fret bytes other than a fret number
+FRET_NONE = 255
+FRET_GHOST = 254
+FRET_VALUE = 253
+MAX_FRET_BYTE = 252
+
+int_struct = struct.Struct('<i')
+length_struct = struct.Struct('<I')
+
+
+class TokenCacheFormatException(Exception):
+    pass
+
+
+def get_source_digest(in_file):
+    """ SHA-256 of the source file content.
+    """
+    digest = hashlib.sha256()
+    with open(in_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def get_cache_file(in_file, cache_dir=None):
+    """ Cache file of in_file: in cache_dir, or next to in_file.
+    """
+    in_file = Path(in_file)
+    return (Path(cache_dir) if cache_dir else in_file.parent) / f'{in_file.name}.btok'
+
+
+def _encode_value(out, value):
+    if value is None:
+        out.append(VALUE_NONE)
+    elif isinstance(value, int):
+        out.append(VALUE_INT)
+        out += int_struct.pack(value)
+    else:
+        data = str(value).encode('utf-8')
+        if len(data) < 256:
+            out.append(VALUE_SHORT_STR)
+            out.append(len(data))
+        else:
+            out.append(VALUE_STR)
+            out += length_struct.pack(len(data))
+        out += data
+
+
+def _decode_value(data, pos):
+    """ Return the value at pos and the position after it.
+    """
+    tag = data[pos]
+    if tag == VALUE_SHORT_STR:
+        length = data[pos + 1]
+        pos += 2
+        return str(data[pos:pos + length], 'utf-8'), pos + length
+    if tag == VALUE_NONE:
+        return None, pos + 1
+    if tag == VALUE_INT:
+        return int_struct.unpack_from(data, pos + 1)[0], pos + 5
+    if tag == VALUE_STR:
+        length = length_struct.unpack_from(data, pos + 1)[0]
+        pos += 5
+        return str(data[pos:pos + length], 'utf-8'), pos + length
+    raise TokenCacheFormatException(f'Invalid value tag {tag} at {pos}')
+
+
+def _decode_frets(data, pos, nb_frets):
+    """ Return the frets tuple at pos and the position after it.
+    """
+    frets = []
+    for _ in range(nb_frets):
+        fret = data[pos]
+        pos += 1
+        if fret == FRET_NONE:
+            fret = None
+        elif fret == FRET_GHOST:
+            fret = GHOST
+        elif fret == FRET_VALUE:
+            fret, pos = _decode_value(data, pos)
+        frets.append(fret)
+    return tuple(frets), pos
+
+
+def dump_tokens(tokens, digest):
+    """ Return the cache content of the tokens of a source of SHA-256 digest.
+    """
+    out = bytearray(header_struct.pack(MAGIC, FORMAT_VERSION, TOKENIZER_VERSION, digest))
+    for token in tokens:
+        out.append(token_codes[token.__class__])
+        if isinstance(token, SingletonToken):
+            continue
+        if isinstance(token, NoteToken):
+            _encode_value(out, token.duration)
+            out.append(len(token.frets))
+            for fret in token.frets:
+                if fret is None:
+                    out.append(FRET_NONE)
+                elif fret == GHOST:
+                    out.append(FRET_GHOST)
+                elif isinstance(fret, int) and 0 <= fret <= MAX_FRET_BYTE:
+                    out.append(fret)
+                else:
+                    out.append(FRET_VALUE)
+                    _encode_value(out, fret)
+        else:
+            _encode_value(out, token.value)
+    return bytes(out)
+
+
+def load_tokens(data, digest):
+    """ Return the tokens of the cache content data, or None if it was not built from a
+        source of SHA-256 digest by this version of the tokenizer.
+    """
+    if len(data) < header_struct.size:
+        return None
+    magic, format_version, tokenizer_version, source_digest = header_struct.unpack_from(data)
+    if (magic != MAGIC or format_version != FORMAT_VERSION or tokenizer_version != TOKENIZER_VERSION
+            or source_digest != digest):
+        return None
+    tokens = []
+    append = tokens.append
+    # Frets repeat a lot: their decoded tuples are shared
+    frets_memo = {}
+    pos = header_struct.size
+    end = len(data)
+    try:
+        while pos < end:
+            token_class = token_classes[data[pos]]
+            pos += 1
+            if token_class in singleton_classes:
+                append(token_class())
+            elif token_class is NoteToken:
+                duration, pos = _decode_value(data, pos)
+                nb_frets = data[pos]
+                key = data[pos:pos + 1 + nb_frets]
+                frets = frets_memo.get(key)
+                if frets is None:
+                    frets, pos = _decode_frets(data, pos + 1, nb_frets)
+                    if FRET_VALUE not in key:
+                        frets_memo[key] = frets
+                else:
+                    pos += 1 + nb_frets
+                append(NoteToken(duration, frets))
+            else:
+                value, pos = _decode_value(data, pos)
+                # Bypass the constructors parsing the tablature symbols
+                token = token_class.__new__(token_class)
+                token.value = value
+                append(token)
+    except (IndexError, struct.error) as e:
+        raise TokenCacheFormatException(f'Truncated token cache: {e}')
+    except UnicodeDecodeError as e:
+        raise TokenCacheFormatException(f'Corrupted token cache: {e}')
+    if not tokens or not isinstance(tokens[-1], EndToken):
+        raise TokenCacheFormatException('Token cache without end token')
+    return tokens
+
+
+class TokenReplayer:
+    """ Tokenizer interface over a list of tokens ending with an EndToken.
+    """
+    def __init__(self, tokens):
+        self.reader = None
+        self.tokens = tokens
+        self.index = 0
+
+    def get_next_token(self):
+        if self.index >= len(self.tokens):
+            return EndToken()
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def __iter__(self):
+        tokens = self.tokens[self.index:]
+        self.index = len(self.tokens)
+        return iter(tokens)
+
+
+class TokenRecorder:
+    """ Tokenizer wrapper saving the token stream to cache_file once the EndToken is reached.
+    """
+    def __init__(self, tokenizer, cache_file, digest):
+        self.tokenizer = tokenizer
+        self.reader = tokenizer.reader
+        self.cache_file = Path(cache_file)
+        self.digest = digest
+        self.tokens = []
+
+    def get_next_token(self):
+        token = self.tokenizer.get_next_token()
+        self._record(token)
+        return token
+
+    def __iter__(self):
+        for token in self.tokenizer:
+            self._record(token)
+            yield token
+
+    def _record(self, token):
+        if self.tokens is None:
+            return
+        self.tokens.append(token)
+        if isinstance(token, EndToken):
+            self.save()
+
+    def save(self):
+        tokens, self.tokens = self.tokens, None
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # Unique temporary file: parallel jobs may write the same cache
+            tmp_path = self.cache_file.with_name(f'{self.cache_file.name}.{os.getpid()}.tmp')
+            tmp_path.write_bytes(dump_tokens(tokens, self.digest))
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logging.warning(f'Cannot write token cache {self.cache_file}: {e}')
+
+
+def cached_tokenizer(in_file, cache_dir=None, backend='python', use_mmap=True):
+    """ Return a tokenizer of in_file replaying its token cache (in cache_dir, or next to
+        in_file) if it is up to date, or else tokenizing the file (see BtabMmapReader for
+        use_mmap) and writing the cache. The reader of the tokenizer, if any, is to be closed.
+    """
+    digest = get_source_digest(in_file)
+    cache_file = get_cache_file(in_file, cache_dir)
+    try:
+        tokens = load_tokens(cache_file.read_bytes(), digest)
+    except FileNotFoundError:
+        tokens = None
+    except (OSError, TokenCacheFormatException) as e:
+        logging.warning(f'Ignoring invalid token cache {cache_file}: {e}')
+        tokens = None
+    if tokens is not None:
+        logging.debug(f'Tokens of {in_file} read from {cache_file}')
+        return TokenReplayer(tokens)
+    return TokenRecorder(create_tokenizer(BtabMmapReader(in_file, use_mmap=use_mmap), backend), cache_file, digest)
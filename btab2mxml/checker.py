@@ -0,0 +1,59 @@
+""" Validation of tablatures without building the score: reader, tokenizer and the
+    IrBuilder semantic pass (integer durations, no music21 object).
+
+    Diagnostics are printed as 'file:line:column: severity: message [code]', the line
+    being the first line of the staff block and the column the one of the last symbol read.
+"""
+from dataclasses import dataclass
+import logging
+from btab2mxml.btab.btab_reader import BtabMmapReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.ir.ir_builder import IrBuilder
+
+
+@dataclass(slots=True)
+class Diagnostic:
+    file: str
+    line: int
+    column: int
+    severity: str
+    code: str
+    message: str
+
+    def format(self):
+        return f'{self.file}:{self.line}:{self.column}: {self.severity}: {self.message} [{self.code}]'
+
+
+class BtabChecker(IrBuilder):
+    """ IrBuilder collecting the problems of the tablature as diagnostics, instead of logging them.
+    """
+    def __init__(self, tokenizer, file_name=''):
+        super().__init__(tokenizer)
+        self.file_name = str(file_name)
+        self.diagnostics = []
+
+    def _report(self, level, code, message):
+        line, column = self.tokenizer.reader.get_position()
+        self.diagnostics.append(Diagnostic(self.file_name, line, column,
+                                           logging.getLevelName(level).lower(), code, message))
+
+    def check(self):
+        """ Return the diagnostics of the whole tablature.
+        """
+        try:
+            self.build()
+        except Exception as e:
+            # Tablature too broken to go on
+            self._report(logging.ERROR, 'fatal', f'{e.__class__.__name__}: {e}')
+        return self.diagnostics
+
+
+def check_file(file_name, song=None):
+    """ Return the diagnostics of a tablature file, or of one song (ArchiveSong) of an archive.
+    """
+    if song is None:
+        reader = BtabMmapReader(file_name)
+    else:
+        reader = BtabMmapReader(file_name, start=song.start, stop=song.stop, first_line=song.first_line)
+    with reader:
+        return BtabChecker(BtabTokenizer(reader), file_name).check()
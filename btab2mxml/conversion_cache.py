@@ -0,0 +1,76 @@
+import hashlib
+import json
+import logging
+import os
+from btab2mxml import __version__
+
+
+class ConversionCache:
+    """ Manifest of the converted files, stored in the output directory.
+
+        Each output file name is associated with a key hashing the content of its source,
+        the tool version and the conversion options: an output whose key did not change
+        does not need to be rebuilt.
+    """
+    file_name = '.btab2mxml-cache.json'
+    format_version = 1
+
+    def __init__(self, outdir):
+        self.path = outdir / self.file_name
+        self.entries = {}
+        self.modified = False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                content = json.load(f)
+            if content.get('format') == self.format_version:
+                self.entries = content['entries']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, AttributeError) as e:
+            logging.warning(f'Ignoring invalid conversion cache {self.path}: {e}')
+
+    @staticmethod
+    def get_key(in_file, options):
+        """ Hash of the input file content, the tool version and the options.
+        """
+        digest = hashlib.sha256()
+        with open(in_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+        digest.update(f'\0{__version__}\0{json.dumps(options, sort_keys=True)}'.encode())
+        return digest.hexdigest()
+
+    def get_status(self, out_file, key):
+        """ Return 'fresh' if out_file was built from this key, 'stale' if it was built
+            from another one, or 'unknown'.
+        """
+        entry = self.entries.get(out_file.name)
+        if entry is None or not out_file.exists():
+            return 'unknown'
+        return 'fresh' if entry == key else 'stale'
+
+    def get_outputs_status(self, out_files, key):
+        """ Status (see get_status) of all the output files of a conversion: 'fresh' only if
+            each of them is, 'stale' if one of them is.
+        """
+        statuses = {self.get_status(out_file, key) for out_file in out_files}
+        if statuses == {'fresh'}:
+            return 'fresh'
+        return 'stale' if 'stale' in statuses else 'unknown'
+
+    def set(self, out_file, key):
+        self.entries[out_file.name] = key
+        self.modified = True
+
+    def remove(self, out_file):
+        if self.entries.pop(out_file.name, None) is not None:
+            self.modified = True
+
+    def save(self):
+        if not self.modified:
+            return
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': self.format_version, 'entries': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.modified = False
@@ -0,0 +1,112 @@
+""" Compact, music21-free representation of a parsed tablature.
+
+    Durations are integers in ticks, pitches are MIDI numbers.
+"""
+from dataclasses import dataclass, field
+from fractions import Fraction
+
+# Lengths are counted in ticks, 96 per quarter: dotted 32nd notes and triplets stay integers
+TICKS_PER_QUARTER = 96
+
+# Duration code: (music21 type, dots, length in ticks), from the longest one
+notes_duration = {
+    'W': ('whole', 1, 6 * TICKS_PER_QUARTER),
+    'w': ('whole', 0, 4 * TICKS_PER_QUARTER),
+    'H': ('half', 1, 3 * TICKS_PER_QUARTER),
+    'h': ('half', 0, 2 * TICKS_PER_QUARTER),
+    'Q': ('quarter', 1, TICKS_PER_QUARTER * 3 // 2),
+    'q': ('quarter', 0, TICKS_PER_QUARTER),
+    'E': ('eighth', 1, TICKS_PER_QUARTER * 3 // 4),
+    'e': ('eighth', 0, TICKS_PER_QUARTER // 2),
+    'S': ('16th', 1, TICKS_PER_QUARTER * 3 // 8),
+    's': ('16th', 0, TICKS_PER_QUARTER // 4),
+    'T': ('32nd', 1, TICKS_PER_QUARTER * 3 // 16),
+    't': ('32nd', 0, TICKS_PER_QUARTER // 8),
+}
+
+# MIDI number of the open strings, from the highest one
+string_pitches = (55, 50, 45, 40, 35)
+
+# Pitch used in place of an invalid one (C4), as BtabParser does
+default_pitch = 60
+
+@dataclass(slots=True, eq=False)
+class IrNote:
+    """ A note, a chord (several pitches) or a rest (no pitch).
+    """
+    code: str
+    duration: int
+    pitches: tuple = ()
+    ghosts: tuple = ()
+    triplet: bool = False
+    tie: bool = False
+    bend: bool = False
+    # Note from which a slur ('h' or 'p') or a glissando leads to this one
+    slur_from: 'IrNote' = None
+    slur_text: str = None
+    glissando_from: 'IrNote' = None
+
+    def is_rest(self):
+        return len(self.pitches) == 0
+
+    def ticks(self):
+        """ Length in ticks, triplet included.
+        """
+        return triplet_ticks(self.duration) if self.triplet else self.duration
+
+
+@dataclass(slots=True, eq=False)
+class IrMeasure:
+    number: int
+    notes: list = field(default_factory=list)
+    time_signature: str = None
+    repeat_start: bool = False
+    repeat_end: bool = False
+    repeat_count: str = None
+
+    def ticks(self):
+        """ Length of the notes in ticks.
+        """
+        return sum(n.ticks() for n in self.notes)
+
+
+@dataclass(slots=True, eq=False)
+class IrSong:
+    title: str = None
+    copyright: str = None
+    nb_strings: int = 0
+    measures: list = field(default_factory=list)
+
+
+def triplet_ticks(ticks):
+    """ Length in ticks of a note of ticks played in a triplet (exact: lengths are multiples of 3 ticks).
+    """
+    return ticks * 2 // 3
+
+
+def time_signature_ticks(time_signature):
+    """ Length of a measure in ticks, for a 'n/d' time signature (exact for d up to 128).
+    """
+    nom, denom = (int(d) for d in time_signature.split('/'))
+    return nom * 4 * TICKS_PER_QUARTER // denom
+
+
+def measure_rest_codes(time_signature):
+    """ Duration codes of the rests filling a measure, longest first; used for measure-long rests.
+    """
+    length = time_signature_ticks(time_signature)
+    codes = []
+    for code, (_, _, ticks) in notes_duration.items():
+        while length >= ticks:
+            codes.append(code)
+            length -= ticks
+    return codes
+
+
+def quarter_length(ticks):
+    """ Length of ticks in quarter notes, as music21 displays it: float when it is exact, else Fraction.
+    """
+    length = Fraction(ticks, TICKS_PER_QUARTER)
+    if length.denominator & (length.denominator - 1) == 0:
+        return float(length)
+    return length
@@ -0,0 +1,78 @@
+from btab2mxml.btab.btab_builder import BtabBuilder
+from btab2mxml.ir.ir import *
+
+
+class IrBuilder(BtabBuilder):
+    """ Build an IrSong from the tokens, with the same rules as BtabParser but without
+        any music21 object.
+    """
+    def __init__(self, tokenizer):
+        super().__init__(tokenizer)
+        self.song = IrSong()
+
+    def build(self):
+        self._read_tokens()
+        return self.song
+
+    def _start_song(self):
+        self.song.nb_strings = self.nb_strings
+
+    def _set_title(self, title):
+        self.song.title = title
+
+    def _set_copyright(self, copyright):
+        self.song.copyright = copyright
+
+    def _new_measure(self, number):
+        return IrMeasure(number)
+
+    def _append_measure(self, measure):
+        self.song.measures.append(measure)
+
+    def _set_time_signature(self, measure, time_signature, explicit):
+        measure.time_signature = time_signature
+
+    def _set_repeat_start(self, measure):
+        measure.repeat_start = True
+
+    def _set_repeat_end(self, measure):
+        measure.repeat_end = True
+
+    def _add_repeat_count(self, measure, count):
+        measure.repeat_count = count
+
+    def _make_pitch(self, string, fret, ghost):
+        """ Return the (MIDI pitch, ghost) played on a string.
+        """
+        return string_pitches[string] + fret, ghost
+
+    def _default_pitch(self):
+        return default_pitch, False
+
+    def _make_note(self, duration_str, pitches):
+        return IrNote(duration_str, notes_duration[duration_str][2], *(tuple(p) for p in zip(*pitches)))
+
+    def _make_tied_note(self, note, duration_str):
+        return IrNote(duration_str, notes_duration[duration_str][2], note.pitches, (False,) * len(note.pitches))
+
+    def _make_rest(self, duration_str):
+        return IrNote(duration_str, notes_duration[duration_str][2])
+
+    def _append_note(self, note):
+        self.current_measure.notes.append(note)
+
+    def _set_tie(self, note):
+        note.tie = True
+
+    def _set_triplet(self, note):
+        note.triplet = True
+
+    def _add_glissando(self, note_from, note_to):
+        note_to.glissando_from = note_from
+
+    def _add_slur(self, note_from, text, note_to):
+        note_to.slur_from = note_from
+        note_to.slur_text = text
+
+    def _add_bend(self, note):
+        note.bend = True
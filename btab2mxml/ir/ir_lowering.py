@@ -0,0 +1,64 @@
+import music21
+from btab2mxml.btab import music21_factory
+from btab2mxml.ir.ir import notes_duration
+
+
+def lower_to_music21(song):
+    """ Build the music21 Score of an IrSong, as BtabParser would have built it.
+    """
+    score = music21.stream.Score(id='mainScore')
+    score.insert(0, music21.metadata.Metadata())
+    score.metadata.title = song.title
+    score.metadata.copyright = song.copyright
+    bass = music21.stream.Part(id='bass')
+    pc = music21.clef.PitchClef()
+    pc.sign = 'F'
+    pc.line = 4
+    bass.append(pc)
+    string_pitches = ['E1', 'A1', 'D2', 'G2']
+    if song.nb_strings == 5:
+        string_pitches.insert(0, 'B0')
+    bass.append(music21.instrument.ElectricBass(stringPitches=string_pitches))
+
+    lowered = {}
+    for ir_measure in song.measures:
+        bass.append(_lower_measure(ir_measure, lowered))
+    score.insert(bass)
+    return score
+
+
+def _lower_measure(ir_measure, lowered):
+    measure = music21.stream.Measure(ir_measure.number)
+    if ir_measure.time_signature is not None:
+        measure.insert(music21.meter.TimeSignature(ir_measure.time_signature))
+    if ir_measure.repeat_start:
+        measure.leftBarline = music21.bar.Repeat(direction='start')
+    for ir_note in ir_measure.notes:
+        note = _lower_note(ir_note)
+        lowered[id(ir_note)] = note
+        if ir_note.glissando_from is not None and id(ir_note.glissando_from) in lowered:
+            music21_factory.add_glissando(measure, lowered[id(ir_note.glissando_from)], note)
+        measure.append(note)
+        if ir_note.slur_from is not None and id(ir_note.slur_from) in lowered:
+            music21_factory.add_slur(measure, lowered[id(ir_note.slur_from)], note, ir_note.slur_text)
+        if ir_note.bend:
+            music21_factory.add_bend(measure, note)
+    if ir_measure.repeat_count is not None:
+        music21_factory.add_repeat_count(measure, ir_measure.repeat_count)
+    if ir_measure.repeat_end:
+        measure.rightBarline = music21.bar.Repeat(direction='end')
+    return measure
+
+
+def _lower_note(ir_note):
+    duration_type, dots, _ = notes_duration[ir_note.code]
+    duration = music21_factory.get_duration(duration_type, dots)
+    if ir_note.is_rest():
+        note = music21.note.Rest(duration=duration)
+    else:
+        note = music21_factory.get_note([music21.pitch.Pitch(ps=p) for p in ir_note.pitches], duration, ir_note.ghosts)
+    if ir_note.tie:
+        note.tie = music21.tie.Tie('start')
+    if ir_note.triplet:
+        note.duration.quarterLength = note.duration.quarterLength * 2 / 3
+    return note
@@ -1,10 +1,21 @@
 from argparse import  ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
+import importlib
+import json
 import logging
+import os
+import sys
+import time
 import traceback
-from btab2mxml.btab.btab_reader import BtabReader, BtabReaderBadReadModeException
-from btab2mxml.btab.btab_tokenizer import BtabTokenizer, EndToken
-from btab2mxml.btab.btab_parser import BtabParser
+from btab2mxml.btab.btab_archive import ArchiveSong, index_archive
+from btab2mxml.btab.btab_reader import BtabMmapReader, BtabReaderBadReadModeException
+from btab2mxml.conversion_cache import ConversionCache
+from btab2mxml.output_formats import get_output_files, parse_formats, suffixes
+from btab2mxml.profiling import Profiler, merge_reports
+from btab2mxml.watcher import Watcher
 
 
 def normalize_suffix(s):
@@ -14,11 +25,40 @@ def parse_args():
     parser = ArgumentParser(description="Supported arguments")
     parser.add_argument("--infile", type=Path, nargs='+', help='Input file name')
     parser.add_argument("--indir", type=Path, nargs='?', help='Input directory')
+    parser.add_argument("--archive", type=Path, nargs='+',
+                        help='Archive files of concatenated tablatures: each song is converted to its own output files')
     parser.add_argument("--outdir", type=Path, default=Path("out"), help="Output directory (default: ./out)")
     parser.add_argument("--suffix", default='btab', type=normalize_suffix, help='Extension for tablature files')
-    parser.add_argument("--overwrite", action='store_true', help="Force overwrite of existing .xml files")
+    parser.add_argument("--overwrite", action='store_true',
+                        help="Force overwrite of existing output files (unless the cache knows they are up to date)")
+    parser.add_argument("--profile", action='store_true',
+                        help="Write per-stage and per-token profiling reports (.profile.json) to the output directory")
+    parser.add_argument("--no-cache", action='store_true',
+                        help="Do not use the conversion cache of the output directory to skip files")
+    parser.add_argument("--watch", action='store_true',
+                        help="After converting, keep running and reconvert the input files as soon as they change")
     parser.add_argument("--verbose", action='store_true', help="Display exception details")
-    return parser.parse_args()
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes (default: 1, 0 = one per CPU)")
+    parser.add_argument("--writer", choices=['music21', 'direct', 'stream'], default='music21',
+                        help="MusicXML writer: music21 export, direct lightweight writer, or the direct writer"
+                             " streaming the measures as they are parsed, in bounded memory (default: music21)")
+    parser.add_argument("--token-cache", nargs='?', const='', metavar='DIR',
+                        help="Cache the token stream of each input file (in DIR, or next to the file), and reuse it"
+                             " while the file does not change")
+    parser.add_argument("--check", action='store_true',
+                        help="Only validate the input files, without converting them: print the diagnostics,"
+                             " exit with status 1 on errors")
+    parser.add_argument("--strict", action='store_true', help="With --check, also exit with status 1 on warnings")
+    parser.add_argument("--format", dest='formats', type=parse_formats, default=['musicxml'],
+                        help="Comma separated output formats, written from a single parse: musicxml, midi"
+                             " (repeats not expanded), json (dump of the notes) (default: musicxml)")
+    parser.add_argument("--parallel-formats", action='store_true',
+                        help="Write the output formats of a file concurrently, in forked processes")
+    args = parser.parse_args()
+    if args.writer == 'stream' and args.formats != ['musicxml']:
+        parser.error("--writer stream only writes the musicxml format")
+    return args
 
 
 def setup_logging(verbose: bool, logfile='app.log'):
@@ -41,11 +81,38 @@ def setup_logging(verbose: bool, logfile='app.log'):
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
+@dataclass(slots=True)
+class ConversionJob:
+    """ Conversion of in_file, or of one song of the archive in_file, to out_file;
+        options are the keyword arguments of convert_file.
+    """
+    in_file: Path
+    out_file: Path
+    song: ArchiveSong = None
+    options: dict = field(default_factory=dict)
+
+    def run(self):
+        return convert_file(self.in_file, self.out_file, song=self.song, **self.options)
+
+
+def get_conversion_options(args):
+    """ convert_file keyword arguments of the command line options.
+    """
+    return {'verbose': args.verbose, 'writer': args.writer, 'profile': args.profile, 'formats': args.formats,
+            'parallel_formats': args.parallel_formats}
+
+
 def get_file_stems(path: Path, suffix: str):
     return [f.stem for f in path.iterdir() if f.suffix == suffix and f.is_file()]
 
 def main():
+    if sys.argv[1:2] == ['serve']:
+        from btab2mxml.server import main as serve
+        serve(sys.argv[2:])
+        return
     args = parse_args()
+    if args.check:
+        sys.exit(check(args))
     args.outdir.mkdir(parents=True, exist_ok=True)
     setup_logging(args.verbose)
 
@@ -63,30 +130,284 @@ def main():
             logging.error("Please specify an existing input directory.")
             return
         tab_stems.update(get_file_stems(args.indir, args.suffix))
-        xml_stems.update(get_file_stems(args.outdir, '.xml'))
+        xml_stems.update(get_file_stems(args.outdir, suffixes[args.formats[0]]))
 
-    to_process = sorted(tab_stems) if args.overwrite else sorted(tab_stems - xml_stems)
+    cache = ConversionCache(args.outdir)
+    options = {'writer': args.writer}
+    if args.formats != ['musicxml']:
+        options['formats'] = args.formats
 
-    for stem in to_process:
+    conversion_options = get_conversion_options(args)
+    jobs = []
+    keys = []
+    for stem in sorted(tab_stems):
         # Check if stem was in infile or indir to retrieve its path
         in_file = next((f for f in (args.infile or []) if f.stem == stem), None)
         if not in_file and args.indir:
             in_file = args.indir / f"{stem}{args.suffix}"
-        out_file = args.outdir / f"{stem}.xml"
+        out_file = args.outdir / f"{stem}{suffixes[args.formats[0]]}"
+        out_files = get_output_files(out_file, args.formats).values()
+        key = None
+        status = 'unknown'
+        if not args.no_cache:
+            key = cache.get_key(in_file, options)
+            status = cache.get_outputs_status(out_files, key)
+        if status == 'fresh' or (status == 'unknown' and not args.overwrite and stem in xml_stems
+                                 and all(f.exists() for f in out_files)):
+            continue
+        jobs.append(ConversionJob(in_file, out_file,
+                                  options=dict(conversion_options, token_cache=args.token_cache)))
+        keys.append(key)
 
-        logging.info(f"Conversion : {in_file} -> {out_file}")
-        reader = BtabReader(in_file)
-        tokenizer = BtabTokenizer(reader)
-        parser = BtabParser(tokenizer)
-        try:
-            parser.parse()
-        except Exception as e:
-            logging.error(f"Exception occurred for file {in_file}, {e}")
-            if args.verbose:
-                logging.debug(traceback.format_exc())
+    nb_files = len(tab_stems)
+    for archive in (args.archive or []):
+        if not archive.is_file():
+            logging.error(f"Archive {archive} not found.")
             continue
+        songs = index_archive(archive)
+        logging.info(f"Archive {archive}: {len(songs)} songs")
+        nb_files += len(songs)
+        stems = set()
+        for index, song in enumerate(songs):
+            stem = song.get_file_stem(archive.stem)
+            if stem in stems:
+                stem = f'{stem}-{index + 1}'
+            stems.add(stem)
+            out_file = args.outdir / f"{stem}{suffixes[args.formats[0]]}"
+            if out_file.exists() and not args.overwrite:
+                continue
+            # Archives are not cached: hashing a whole archive for each song would defeat the index
+            jobs.append(ConversionJob(archive, out_file, song, conversion_options))
+            keys.append(None)
+
+    nb_workers = args.jobs if args.jobs > 0 else os.cpu_count()
+    if nb_workers > 1 and len(jobs) > 1:
+        results = convert_parallel(jobs, nb_workers, args.verbose)
+    else:
+        results = [job.run() for job in jobs]
+
+    for job, key, converted in zip(jobs, keys, results):
+        # Without cache, outputs are still rewritten: forget their previous keys
+        update_cache(cache, get_output_files(job.out_file, args.formats).values(), key if converted else None)
+    cache.save()
+
+    if args.profile:
+        write_run_profile(args.outdir / 'profile.json',
+                          [get_profile_file(job.out_file) for job, converted in zip(jobs, results) if converted])
+
+    converted = sum(1 for r in results if r)
+    logging.info(f'Summary: {converted} converted, {nb_files - len(jobs)} skipped, '
+                 f'{len(results) - converted} failed')
+
+    if args.watch:
+        watch(args, cache, options)
+
+
+def update_cache(cache, out_files, key):
+    """ Record the key of the output files of a conversion, or forget them if key is None.
+    """
+    for out_file in out_files:
+        if key is not None:
+            cache.set(out_file, key)
         else:
-            parser.output(out_file)
+            cache.remove(out_file)
+
+
+def check(args):
+    """ Validate the input files and archives, print their diagnostics.
+        Return the exit status: 1 if an error (or, with --strict, a warning) was found.
+    """
+    from btab2mxml.checker import check_file
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format='%(levelname)s - %(message)s')
+    if args.indir and not args.indir.is_dir():
+        logging.error("Please specify an existing input directory.")
+        return 1
+    checks = [(in_file, None) for in_file in sorted(get_watched_files(args))]
+    for archive in (args.archive or []):
+        if not archive.is_file():
+            logging.error(f"Archive {archive} not found.")
+            continue
+        checks.extend((archive, song) for song in index_archive(archive))
+    failed = False
+    for in_file, song in checks:
+        for diagnostic in check_file(in_file, song):
+            print(diagnostic.format())
+            failed = failed or diagnostic.severity == 'error' or args.strict
+    return 1 if failed else 0
+
+
+def get_watched_files(args):
+    files = [f for f in (args.infile or []) if f.suffix == args.suffix]
+    if args.indir:
+        files.extend(f for f in args.indir.iterdir() if f.suffix == args.suffix and f.is_file())
+    return files
+
+
+def watch(args, cache, options):
+    """ Reconvert the input files as soon as they change, until interrupted.
+    """
+    # Load music21 once for all, rather than on the first change
+    importlib.import_module('btab2mxml.btab.btab_parser')
+
+    def convert_changed(files):
+        for in_file in files:
+            out_file = args.outdir / f"{in_file.stem}{suffixes[args.formats[0]]}"
+            out_files = get_output_files(out_file, args.formats).values()
+            key = None
+            if not args.no_cache:
+                key = cache.get_key(in_file, options)
+                if cache.get_outputs_status(out_files, key) == 'fresh':
+                    # Saved without change
+                    continue
+            start = time.perf_counter()
+            # Read rather than mapped: the file may be truncated by an editor while it is read
+            converted = convert_file(in_file, out_file, token_cache=args.token_cache, use_mmap=False,
+                                     **get_conversion_options(args))
+            if converted:
+                logging.info(f"{out_file} updated in {time.perf_counter() - start:.2f} s")
+            update_cache(cache, out_files, key if converted else None)
+        cache.save()
+
+    watcher = Watcher(lambda: get_watched_files(args))
+    logging.info("Watching for changes (Ctrl-C to stop)")
+    try:
+        watcher.run(convert_changed)
+    except KeyboardInterrupt:
+        logging.info("Watch stopped")
+
+
+def get_profile_file(out_file):
+    return out_file.with_suffix('.profile.json')
+
+
+def write_run_profile(filename, profile_files):
+    reports = []
+    for profile_file in profile_files:
+        with open(profile_file, encoding='utf-8') as f:
+            reports.append(json.load(f))
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({'files': reports, 'total': merge_reports(reports)}, f, indent=1)
+
+
+def convert_file(in_file, out_file, *, verbose=False, writer='music21', profile=False, song=None, tokenizer='python',
+                 token_cache=None, formats=('musicxml',), parallel_formats=False, use_mmap=True):
+    """ Run the reader -> tokenizer -> parser -> write pipeline on one file, or on
+        one song (ArchiveSong) of an archive file, with the tokenizer backend.
+        Unless token_cache is None, the tokens of a file are read from (or written to) its
+        token cache, in the token_cache directory or next to the file if empty.
+        The score is parsed once and written in each of the formats: out_file for the first
+        one, out_file with the suffix of the format for the others (concurrently with parallel_formats).
+        Return True if the file was converted.
+        With profile, the profiling report is written next to out_file.
+        Without use_mmap, the file is read into memory rather than memory-mapped.
+    """
+    # Imported here: music21 (and numpy) are only needed once a score has to be built
+    from btab2mxml.btab.btab_numpy_tokenizer import create_tokenizer
+    from btab2mxml.btab.btab_parser import BtabParser
+    from btab2mxml.btab.token_cache import cached_tokenizer
+
+    if song is None:
+        logging.info(f"Conversion : {in_file} -> {out_file}")
+    else:
+        logging.info(f"Conversion : {in_file} [{song.start}:{song.stop}] -> {out_file}")
+    profiler = Profiler() if profile else None
+    stage = profiler.stage if profiler is not None else (lambda name: nullcontext())
+    reader = None
+    try:
+        if song is not None:
+            reader = BtabMmapReader(in_file, start=song.start, stop=song.stop, first_line=song.first_line,
+                                    use_mmap=use_mmap)
+            tokenizer = create_tokenizer(reader, tokenizer)
+        elif token_cache is not None:
+            tokenizer = cached_tokenizer(in_file, token_cache, tokenizer, use_mmap=use_mmap)
+            reader = tokenizer.reader
+        else:
+            reader = BtabMmapReader(in_file, use_mmap=use_mmap)
+            tokenizer = create_tokenizer(reader, tokenizer)
+        parser = BtabParser(tokenizer, profiler=profiler)
+        if profiler is not None:
+            # No reader when the tokens are replayed from the cache
+            if tokenizer.reader is not None:
+                profiler.instrument(tokenizer.reader, ('read_line', 'get_next_score_symbol'), 'reader')
+            profiler.instrument(tokenizer, ('get_next_token',), 'tokenizer')
+        if writer == 'stream':
+            # Parse and output are interleaved
+            with stage('parser'):
+                parser.parse_streaming(out_file)
+        else:
+            with stage('parser'):
+                parser.parse()
+            with stage('output'):
+                if len(formats) == 1:
+                    parser.output(out_file, writer=writer, output_format=formats[0])
+                else:
+                    outputs = get_output_files(out_file, formats)
+                    outputs[formats[0]] = out_file
+                    parser.export(outputs, writer=writer, concurrent=parallel_formats)
+        if profiler is not None:
+            profiler.write_report(get_profile_file(out_file), file=str(in_file))
+    except Exception as e:
+        logging.error(f"Exception occurred for file {in_file}, {e}")
+        if verbose:
+            logging.debug(traceback.format_exc())
+        return False
+    finally:
+        if reader is not None:
+            reader.close()
+        if profiler is not None:
+            profiler.stop()
+    return True
+
+
+class _RecordCollector(logging.Handler):
+    """ Keep the log records of a worker so that the parent process can emit them in order.
+    """
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # Format now: arguments and tracebacks may not be picklable
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+
+def _init_worker(verbose):
+    logger = logging.getLogger()
+    # Handlers inherited from the parent would write concurrently to the same outputs
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+
+def _convert_job(job):
+    logger = logging.getLogger()
+    collector = _RecordCollector()
+    logger.addHandler(collector)
+    try:
+        converted = job.run()
+    finally:
+        logger.removeHandler(collector)
+    return converted, collector.records
+
+
+def convert_parallel(jobs, nb_workers, verbose=False):
+    """ Convert the ConversionJobs in a pool of worker processes.
+        Logs of each file are emitted after its conversion, in the order of the jobs.
+    """
+    results = []
+    logger = logging.getLogger()
+    with ProcessPoolExecutor(max_workers=nb_workers, initializer=_init_worker,
+                             initargs=(verbose,)) as executor:
+        for converted, records in executor.map(_convert_job, jobs):
+            for record in records:
+                logger.handle(record)
+            results.append(converted)
+    return results
 
 if __name__ == "__main__":
     main()
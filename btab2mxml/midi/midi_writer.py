@@ -0,0 +1,100 @@
+import struct
+import music21
+
+
+def _variable_length(value):
+    """ MIDI variable length quantity: 7 bits per byte, most significant first.
+    """
+    data = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        data.insert(0, 0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(data)
+
+
+def _meta_event(meta_type, data):
+    return bytes([0xFF, meta_type]) + _variable_length(len(data)) + data
+
+
+class MidiWriter:
+    """ Write a standard MIDI file (format 0, one track) directly from the parsed measures.
+
+        The measures are played in their written order: repeats are not expanded. Tied notes
+        are merged, ghost notes are played softer.
+    """
+    ticks_per_quarter = 480
+    tempo = 500000  # microseconds per quarter note (120 bpm)
+    channel = 0
+    velocity = 90
+    ghost_velocity = 40
+
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, metadata, part):
+        """ Write the whole file for the given metadata and part.
+        """
+        # (tick, order, event): meta events first, then note offs before note ons
+        events = [(0, 0, _meta_event(0x51, self.tempo.to_bytes(3, 'big')))]
+        if metadata is not None and metadata.title:
+            events.append((0, 0, _meta_event(0x03, metadata.title.encode('utf-8'))))
+        if metadata is not None and metadata.copyright is not None:
+            events.append((0, 0, _meta_event(0x02, str(metadata.copyright).encode('utf-8'))))
+        instrument = part.getInstrument(returnDefault=False)
+        if instrument is not None and instrument.midiProgram is not None:
+            events.append((0, 0, bytes([0xC0 | self.channel, instrument.midiProgram])))
+
+        # Pitch -> [start, end, pitch, velocity] of the notes tied to the next one
+        tied = {}
+        notes = []
+        measure_start = 0
+        bar_duration = None
+        for measure in part.getElementsByClass(music21.stream.Measure):
+            for ts in measure.getElementsByClass(music21.meter.TimeSignature):
+                bar_duration = ts.barDuration.quarterLength
+                events.append((self._ticks(measure_start), 0, _meta_event(
+                    0x58, bytes([ts.numerator, ts.denominator.bit_length() - 1, 24, 8]))))
+            end = 0
+            for general_note in measure.notesAndRests:
+                start = general_note.offset
+                end = max(end, start + general_note.duration.quarterLength)
+                # Only the next note continues a tie: the parser marks the start of the ties only
+                previous, tied = tied, {}
+                if isinstance(general_note, music21.note.Rest):
+                    continue
+                tie = general_note.tie.type if general_note.tie is not None else None
+                note_end = measure_start + start + general_note.duration.quarterLength
+                for note in (general_note.notes if isinstance(general_note, music21.chord.Chord) else [general_note]):
+                    pitch = min(max(note.pitch.midi, 0), 127)
+                    midi_note = previous.get(pitch)
+                    if midi_note is not None:
+                        midi_note[1] = note_end
+                    else:
+                        velocity = self.ghost_velocity if note.notehead == 'x' else self.velocity
+                        midi_note = [measure_start + start, note_end, pitch, velocity]
+                        notes.append(midi_note)
+                    if tie in ('start', 'continue'):
+                        tied[pitch] = midi_note
+            # Incomplete measures are completed with rests, as in the MusicXML output
+            measure_start += max(end, bar_duration or 0)
+
+        on, off = 0x90 | self.channel, 0x80 | self.channel
+        for start, end, pitch, velocity in notes:
+            events.append((self._ticks(start), 2, bytes([on, pitch, velocity])))
+            events.append((self._ticks(end), 1, bytes([off, pitch, 0])))
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        track = bytearray()
+        tick = 0
+        for event_tick, _, event in events:
+            track += _variable_length(event_tick - tick)
+            track += event
+            tick = event_tick
+        track += b'\x00' + _meta_event(0x2F, b'')
+        self.output.write(b'MThd' + struct.pack('>IHHH', 6, 0, 1, self.ticks_per_quarter))
+        self.output.write(b'MTrk' + struct.pack('>I', len(track)) + track)
+        self.output.flush()
+
+    def _ticks(self, quarter_length):
+        return int(round(quarter_length * self.ticks_per_quarter))
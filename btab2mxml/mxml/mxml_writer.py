@@ -0,0 +1,334 @@
+import io
+from xml.sax.saxutils import escape, quoteattr
+import music21
+
+
+class MxmlWriter:
+    """ Write a MusicXML partwise document directly from the parsed measures.
+
+        This skips the music21 export pass (makeNotation, beams, stems, accidental
+        display): only the musical content built by BtabParser is written.
+    """
+    divisions = 10080
+    indent = '  '
+
+    def __init__(self, output):
+        if isinstance(output, io.TextIOBase):
+            self.output = output
+            self.wrapped = False
+        else:
+            self.output = io.TextIOWrapper(output, encoding='utf-8', newline='\n')
+            self.wrapped = True
+        self.depth = 0
+        self.part_id = 'P1'
+        # Spanner events (kind, id of the spanner, start/stop) attached to notes, by note id
+        self.note_spanners = {}
+        self.spanner_numbers = {}
+        self.first_measure = True
+        self.clef = None
+        self.bar_duration = None
+
+    def write(self, metadata, part):
+        """ Write the whole document for the given metadata and part.
+        """
+        measures = list(part.getElementsByClass(music21.stream.Measure))
+        for measure in measures:
+            self.add_spanners(measure.getElementsByClass(music21.spanner.Spanner))
+        self.start_document(metadata, part)
+        for measure in measures:
+            self.write_measure(measure)
+        self.end_document()
+
+    def add_spanners(self, spanners):
+        """ Register slurs, glissandi, hammer-ons and pull-offs, so that their ends are written
+            with the notes.
+        """
+        for spanner in spanners:
+            if isinstance(spanner, music21.spanner.Glissando):
+                kind = 'slide'
+            elif isinstance(spanner, music21.spanner.Slur):
+                kind = 'slur'
+            elif isinstance(spanner, music21.articulations.HammerOn):
+                kind = 'hammer-on'
+            elif isinstance(spanner, music21.articulations.PullOff):
+                kind = 'pull-off'
+            else:
+                continue
+            first, last = spanner.getFirst(), spanner.getLast()
+            if first is None or last is None:
+                continue
+            self.note_spanners.setdefault(id(first), []).append((kind, id(spanner), 'start'))
+            self.note_spanners.setdefault(id(last), []).append((kind, id(spanner), 'stop'))
+
+    def start_document(self, metadata, part):
+        self.output.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        self.output.write('<!DOCTYPE score-partwise  PUBLIC "-//Recordare//DTD MusicXML 4.0 Partwise//EN"'
+                          ' "http://www.musicxml.org/dtds/partwise.dtd">\n')
+        self._start('score-partwise', version='4.0')
+        if metadata is not None and metadata.title:
+            self._start('work')
+            self._leaf('work-title', metadata.title)
+            self._end('work')
+            self._leaf('movement-title', metadata.title)
+        self._start('identification')
+        if metadata is not None and metadata.copyright is not None:
+            self._leaf('rights', str(metadata.copyright))
+        self._start('encoding')
+        self._leaf('software', 'btab2mxml')
+        self._end('encoding')
+        self._end('identification')
+
+        instrument = part.getInstrument(returnDefault=False)
+        clefs = part.getElementsByClass(music21.clef.Clef)
+        self.clef = clefs.first() if clefs else None
+        self._start('part-list')
+        self._start('score-part', id=self.part_id)
+        self._leaf('part-name', instrument.instrumentName if instrument else '')
+        if instrument is not None:
+            if instrument.instrumentAbbreviation:
+                self._leaf('part-abbreviation', instrument.instrumentAbbreviation)
+            self._start('score-instrument', id='I1')
+            self._leaf('instrument-name', instrument.instrumentName)
+            self._end('score-instrument')
+            if instrument.midiProgram is not None:
+                self._start('midi-instrument', id='I1')
+                self._leaf('midi-channel', '1')
+                self._leaf('midi-program', str(instrument.midiProgram + 1))
+                self._end('midi-instrument')
+        self._end('score-part')
+        self._end('part-list')
+        self._start('part', id=self.part_id)
+
+    def end_document(self):
+        self._end('part')
+        self._end('score-partwise')
+        self.output.flush()
+        if self.wrapped:
+            # Leave the binary output open for the caller
+            self.output.detach()
+
+    def write_measure(self, measure):
+        self._start('measure', number=str(measure.number))
+        time_signatures = [ts for ts in measure.getElementsByClass(music21.meter.TimeSignature)]
+        if self.first_measure or time_signatures:
+            self._start('attributes')
+            if self.first_measure:
+                self._leaf('divisions', str(self.divisions))
+            for ts in time_signatures:
+                self.bar_duration = ts.barDuration.quarterLength
+                self._start('time')
+                self._leaf('beats', str(ts.numerator))
+                self._leaf('beat-type', str(ts.denominator))
+                self._end('time')
+            if self.first_measure and self.clef is not None:
+                self._start('clef')
+                self._leaf('sign', self.clef.sign)
+                if self.clef.line is not None:
+                    self._leaf('line', str(self.clef.line))
+                self._end('clef')
+            self._end('attributes')
+            self.first_measure = False
+        if measure.leftBarline is not None:
+            self._write_barline(measure.leftBarline, 'left')
+        notes = measure.notesAndRests
+        measure_rest = (len(notes) == 1 and isinstance(notes[0], music21.note.Rest)
+                        and notes[0].duration.quarterLength == self.bar_duration)
+        tuplet_types = self._get_tuplet_types(notes)
+        total_duration = 0
+        for element in measure:
+            if isinstance(element, music21.note.GeneralNote):
+                self._write_general_note(element, measure_rest, tuplet_types.get(id(element)))
+                total_duration += element.duration.quarterLength
+            elif isinstance(element, music21.expressions.TextExpression):
+                self._write_words(element)
+        missing = self.bar_duration - total_duration if self.bar_duration is not None else 0
+        if round(missing * self.divisions) > 0:
+            # Same as music21: complete the measure with hidden rests
+            padding = music21.duration.Duration(missing)
+            for component in (padding.components if padding.type == 'complex' else [padding]):
+                self._write_note(music21.note.Rest(), music21.duration.Duration(component.type,
+                                                                                dots=component.dots),
+                                 None, [], hidden=True)
+        if measure.rightBarline is not None:
+            self._write_barline(measure.rightBarline, 'right')
+        self._end('measure')
+
+    def _write_barline(self, barline, location):
+        self._start('barline', location=location)
+        if isinstance(barline, music21.bar.Repeat):
+            self._leaf('repeat', direction='forward' if barline.direction == 'start' else 'backward')
+        elif barline.type != 'regular':
+            self._leaf('bar-style', barline.type)
+        self._end('barline')
+
+    def _write_words(self, expression):
+        attrs = {}
+        if expression.style.fontSize is not None:
+            attrs['font-size'] = str(expression.style.fontSize)
+        if expression.style.fontStyle is not None:
+            attrs['font-style'] = expression.style.fontStyle
+        if expression.style.alignHorizontal is not None:
+            attrs['halign'] = expression.style.alignHorizontal
+        placement = expression.placement
+        if placement is not None:
+            self._start('direction', placement=placement)
+        else:
+            self._start('direction')
+        self._start('direction-type')
+        self._leaf('words', expression.content, **attrs)
+        self._end('direction-type')
+        self._end('direction')
+
+    def _write_general_note(self, general_note, measure_rest=False, tuplet_type=None):
+        spanners = self._get_spanner_events(general_note)
+        if isinstance(general_note, music21.chord.Chord):
+            # Spanners and tuplets are written on the first note of the chord only
+            for index, note in enumerate(general_note.notes):
+                if index == 0:
+                    self._write_note(note, general_note.duration, general_note.tie, spanners,
+                                     tuplet_type=tuplet_type)
+                else:
+                    self._write_note(note, general_note.duration, general_note.tie, [], in_chord=True)
+        else:
+            self._write_note(general_note, general_note.duration, general_note.tie, spanners,
+                             measure_rest=measure_rest, tuplet_type=tuplet_type)
+
+    def _get_tuplet_types(self, notes):
+        """ Return the tuplet bracket type ('start', 'stop' or 'startStop') of the notes of a
+            measure starting or ending a tuplet group, by note id, as music21 makeTupletBrackets.
+        """
+        tuplets = [note.duration.tuplets[0] if len(note.duration.tuplets) == 1 else None for note in notes]
+        types = {}
+        count = 0
+        target = None
+        previous = None
+        for index, (note, tuplet) in enumerate(zip(notes, tuplets)):
+            following = tuplets[index + 1] if index + 1 < len(tuplets) else None
+            if tuplet is not None:
+                count += note.duration.quarterLength
+                if previous is None or target is None:
+                    if following is None:
+                        types[id(note)] = 'startStop'
+                        count = 0
+                    else:
+                        types[id(note)] = 'start'
+                        target = tuplet.totalTupletLength()
+                elif following is None or count >= target:
+                    types[id(note)] = 'stop'
+                    target = None
+                    count = 0
+            previous = tuplet
+        return types
+
+    def _get_spanner_events(self, general_note):
+        """ Return the (kind, number, type) notations for this note, stops first.
+        """
+        events = sorted(self.note_spanners.pop(id(general_note), []), key=lambda e: e[2] != 'stop')
+        notations = []
+        for kind, spanner_id, event_type in events:
+            if event_type == 'start':
+                used = set(n for (k, _), n in self.spanner_numbers.items() if k == kind)
+                number = 1
+                while number in used:
+                    number += 1
+                self.spanner_numbers[(kind, spanner_id)] = number
+            else:
+                number = self.spanner_numbers.pop((kind, spanner_id), 1)
+            notations.append((kind, number, event_type))
+        return notations
+
+    def _write_note(self, note, duration, tie, spanners, in_chord=False, measure_rest=False,
+                    hidden=False, tuplet_type=None):
+        if hidden:
+            self._start('note', **{'print-object': 'no', 'print-spacing': 'yes'})
+        else:
+            self._start('note')
+        if in_chord:
+            self._leaf('chord')
+        if measure_rest:
+            self._leaf('rest', measure='yes')
+        elif isinstance(note, music21.note.Rest):
+            self._leaf('rest')
+        else:
+            pitch = note.pitch
+            self._start('pitch')
+            self._leaf('step', pitch.step)
+            if pitch.accidental is not None:
+                alter = pitch.accidental.alter
+                self._leaf('alter', str(int(alter) if alter == int(alter) else alter))
+            self._leaf('octave', str(pitch.implicitOctave))
+            self._end('pitch')
+        self._leaf('duration', str(int(round(duration.quarterLength * self.divisions))))
+        if tie is not None:
+            self._leaf('tie', type=tie.type)
+        if not measure_rest:
+            self._leaf('type', duration.type)
+            for _ in range(duration.dots):
+                self._leaf('dot')
+        if duration.tuplets:
+            tuplet = duration.tuplets[0]
+            self._start('time-modification')
+            self._leaf('actual-notes', str(tuplet.numberNotesActual))
+            self._leaf('normal-notes', str(tuplet.numberNotesNormal))
+            if tuplet.durationNormal is not None:
+                self._leaf('normal-type', tuplet.durationNormal.type)
+            self._end('time-modification')
+        if getattr(note, 'notehead', 'normal') != 'normal':
+            self._leaf('notehead', note.notehead)
+        technicals = [s for s in spanners if s[0] in ('hammer-on', 'pull-off')]
+        if tie is not None or spanners or tuplet_type is not None:
+            self._start('notations')
+            if tie is not None:
+                self._leaf('tied', type=tie.type)
+            for kind, number, event_type in spanners:
+                if kind == 'slide':
+                    self._leaf('slide', **{'line-type': 'solid', 'number': str(number), 'type': event_type})
+                elif kind == 'slur':
+                    self._leaf(kind, number=str(number), type=event_type)
+            if technicals:
+                self._start('technical')
+                for kind, number, event_type in technicals:
+                    text = ('H' if kind == 'hammer-on' else 'P') if event_type == 'start' else None
+                    self._leaf(kind, text, number=str(number), type=event_type)
+                self._end('technical')
+            if tuplet_type is not None:
+                self._write_tuplet(duration.tuplets[0], tuplet_type)
+            self._end('notations')
+        self._end('note')
+
+    def _write_tuplet(self, tuplet, tuplet_type):
+        if tuplet_type in ('start', 'startStop'):
+            attrs = {'bracket': 'yes' if tuplet.bracket and tuplet_type == 'start' else 'no', 'number': '1'}
+            if tuplet.placement is not None:
+                attrs['placement'] = tuplet.placement
+            attrs['type'] = 'start'
+            self._start('tuplet', **attrs)
+            for tag, number, tuplet_duration in (('tuplet-actual', tuplet.numberNotesActual, tuplet.durationActual),
+                                                 ('tuplet-normal', tuplet.numberNotesNormal, tuplet.durationNormal)):
+                self._start(tag)
+                self._leaf('tuplet-number', str(number))
+                if tuplet_duration is not None:
+                    self._leaf('tuplet-type', tuplet_duration.type)
+                    for _ in range(tuplet_duration.dots):
+                        self._leaf('tuplet-dot')
+                self._end(tag)
+            self._end('tuplet')
+        if tuplet_type in ('stop', 'startStop'):
+            self._leaf('tuplet', number='1', type='stop')
+
+    def _attributes(self, attrs):
+        return ''.join(f' {k}={quoteattr(v)}' for k, v in attrs.items())
+
+    def _start(self, tag, **attrs):
+        self.output.write(f'{self.indent * self.depth}<{tag}{self._attributes(attrs)}>\n')
+        self.depth += 1
+
+    def _end(self, tag):
+        self.depth -= 1
+        self.output.write(f'{self.indent * self.depth}</{tag}>\n')
+
+    def _leaf(self, tag, text=None, **attrs):
+        if text is None:
+            self.output.write(f'{self.indent * self.depth}<{tag}{self._attributes(attrs)} />\n')
+        else:
+            self.output.write(f'{self.indent * self.depth}<{tag}{self._attributes(attrs)}>{escape(text)}</{tag}>\n')
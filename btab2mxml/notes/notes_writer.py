@@ -0,0 +1,56 @@
+import io
+import json
+import music21
+
+
+class NotesWriter:
+    """ Write a JSON dump of the notes of the parsed measures: for each measure, its notes,
+        chords and rests with their offset and duration (in quarter notes) and their pitches.
+    """
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, metadata, part):
+        """ Write the whole document for the given metadata and part.
+        """
+        document = {
+            'title': metadata.title if metadata is not None else None,
+            'copyright': str(metadata.copyright) if metadata is not None and metadata.copyright is not None else None,
+            'measures': [self._measure(measure) for measure in part.getElementsByClass(music21.stream.Measure)],
+        }
+        if isinstance(self.output, io.TextIOBase):
+            json.dump(document, self.output, indent=1, ensure_ascii=False)
+        else:
+            self.output.write(json.dumps(document, indent=1, ensure_ascii=False).encode('utf-8'))
+        self.output.flush()
+
+    def _measure(self, measure):
+        time_signatures = measure.getElementsByClass(music21.meter.TimeSignature)
+        return {
+            'number': measure.number,
+            'time_signature': time_signatures[0].ratioString if time_signatures else None,
+            'repeat_start': isinstance(measure.leftBarline, music21.bar.Repeat),
+            'repeat_end': isinstance(measure.rightBarline, music21.bar.Repeat),
+            'words': [e.content for e in measure.getElementsByClass(music21.expressions.TextExpression)],
+            'notes': [self._note(n) for n in measure.notesAndRests],
+        }
+
+    def _note(self, general_note):
+        duration = general_note.duration
+        if isinstance(general_note, music21.note.Rest):
+            notes = []
+        elif isinstance(general_note, music21.chord.Chord):
+            notes = general_note.notes
+        else:
+            notes = [general_note]
+        return {
+            'offset': float(general_note.offset),
+            'duration': float(duration.quarterLength),
+            'type': duration.type,
+            'dots': duration.dots,
+            'triplet': bool(duration.tuplets),
+            'rest': isinstance(general_note, music21.note.Rest),
+            'pitches': [{'name': n.pitch.nameWithOctave, 'midi': n.pitch.midi, 'ghost': n.notehead == 'x'}
+                        for n in notes],
+            'tie': general_note.tie.type if general_note.tie is not None else None,
+        }
@@ -0,0 +1,29 @@
+""" Output formats of a conversion, and their file suffixes.
+"""
+from argparse import ArgumentTypeError
+from pathlib import Path
+
+suffixes = {
+    'musicxml': '.xml',
+    'midi': '.mid',
+    'json': '.json',
+}
+
+
+def parse_formats(text):
+    """ Return the list of formats of a comma separated text (e.g. 'musicxml,midi'), without duplicates.
+    """
+    formats = []
+    for output_format in text.split(','):
+        output_format = output_format.strip().lower()
+        if output_format not in suffixes:
+            raise ArgumentTypeError(f"invalid format '{output_format}' (choose from {', '.join(suffixes)})")
+        if output_format not in formats:
+            formats.append(output_format)
+    return formats
+
+
+def get_output_files(out_file, formats):
+    """ Return the {format: file name} outputs of out_file: same name, with the suffix of each format.
+    """
+    return {output_format: Path(out_file).with_suffix(suffixes[output_format]) for output_format in formats}
@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+import json
+import time
+import tracemalloc
+
+
+class Profiler:
+    """ Opt-in instrumentation of a conversion.
+
+        Stages (reader, tokenizer, parser, output...) record their exclusive wall time,
+        call count and allocated bytes: time spent in a nested stage is only counted
+        in the nested one. Tokens handled by the parser are also recorded by token type.
+        Allocated bytes are the net growth of the memory traced by tracemalloc, only
+        measured with trace_memory (which also slows everything down).
+
+        The report is {'total_time', 'stages': {name: {calls, time, allocated}},
+        'tokens': {token class name: {count, time, allocated}}}; merge_reports() sums
+        the reports of several files.
+    """
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.tokens = {}
+        self.stack = []
+        self.mark = None
+        self.started_tracemalloc = False
+
+    def _now(self):
+        memory = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        return time.perf_counter(), memory
+
+    def _charge(self, now):
+        if self.stack:
+            entry = self.stages[self.stack[-1]]
+            entry['time'] += now[0] - self.mark[0]
+            entry['allocated'] += now[1] - self.mark[1]
+        self.mark = now
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    def stop(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    @contextmanager
+    def stage(self, name):
+        """ Record the code run in the with block as stage name.
+        """
+        if not self.stack:
+            self.start()
+        self._charge(self._now())
+        entry = self.stages.setdefault(name, {'calls': 0, 'time': 0.0, 'allocated': 0})
+        entry['calls'] += 1
+        self.stack.append(name)
+        try:
+            yield
+        finally:
+            self._charge(self._now())
+            self.stack.pop()
+
+    @contextmanager
+    def token(self, token):
+        """ Record the handling of a token, by token type.
+        """
+        start = self._now()
+        try:
+            yield
+        finally:
+            end = self._now()
+            entry = self.tokens.setdefault(token.__class__.__name__, {'count': 0, 'time': 0.0, 'allocated': 0})
+            entry['count'] += 1
+            entry['time'] += end[0] - start[0]
+            entry['allocated'] += end[1] - start[1]
+
+    def instrument(self, obj, method_names, stage_name):
+        """ Record the calls of these methods of obj (an instance) as stage stage_name.
+        """
+        for method_name in method_names:
+            method = getattr(obj, method_name)
+
+            def wrapper(*args, _method=method, **kwargs):
+                with self.stage(stage_name):
+                    return _method(*args, **kwargs)
+            setattr(obj, method_name, wrapper)
+
+    def report(self):
+        return {
+            'total_time': sum(s['time'] for s in self.stages.values()),
+            'stages': self.stages,
+            'tokens': self.tokens,
+        }
+
+    def write_report(self, filename, **extra):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(dict(extra, **self.report()), f, indent=1)
+
+
+def merge_reports(reports):
+    """ Sum the stages and tokens figures of several reports.
+    """
+    merged = {'total_time': 0.0, 'stages': {}, 'tokens': {}}
+    for report in reports:
+        merged['total_time'] += report['total_time']
+        for table in ('stages', 'tokens'):
+            for name, entry in report[table].items():
+                total = merged[table].setdefault(name, dict.fromkeys(entry, 0))
+                for key, value in entry.items():
+                    total[key] += value
+    return merged
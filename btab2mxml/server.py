@@ -0,0 +1,197 @@
+""" Local conversion service: POST the text of a .btab file to /convert, get the MusicXML back.
+
+    btab2mxml serve [--host 127.0.0.1] [--port 8080] [--socket PATH] [--workers N] ...
+
+    Conversions run in a pool of worker processes started, with music21 imported, before
+    the first request. At most workers + queue-size requests are accepted at a time: the
+    next ones are answered 503, and a conversion not done within the timeout is answered 504.
+    A request without Content-Length is answered 411, a body larger than max-body-size 413.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+import logging
+import os
+import socket
+import socketserver
+import threading
+from btab2mxml.api import convert, init_worker
+
+MUSICXML_TYPE = 'application/vnd.recordare.musicxml+xml'
+
+
+def _ping():
+    return os.getpid()
+
+
+def convert_text(text, writer='music21'):
+    """ Convert the text of a .btab file, return (True, MusicXML bytes) or (False, error message).
+    """
+    try:
+        return True, convert(text, writer=writer)
+    except Exception as e:
+        return False, f'{e.__class__.__name__}: {e}'
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self._send(200, 'text/plain', b'ok\n')
+        else:
+            self._send(404, 'text/plain', b'Not found\n')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self._send(404, 'text/plain', b'Not found\n')
+            return
+        writer = parse_qs(url.query).get('writer', [self.server.writer])[0]
+        if writer not in ('music21', 'direct', 'stream'):
+            self._send(400, 'text/plain', f'Unknown writer {writer}\n'.encode())
+            return
+        length = self._get_content_length()
+        if length is None:
+            return
+        text = self.rfile.read(length).decode('utf-8', errors='replace')
+        status, body = self.server.convert(text, writer)
+        content_type = MUSICXML_TYPE if status == 200 else 'text/plain'
+        self._send(status, content_type, body)
+
+    def _get_content_length(self):
+        """ Return the length of the request body, or None once the request is answered
+            with an error (the body is then not read, the connection is closed).
+        """
+        length = self.headers.get('Content-Length')
+        if length is None:
+            status, message = 411, b'Content-Length required\n'
+        elif not length.strip().isdigit():
+            status, message = 400, b'Invalid Content-Length\n'
+        elif int(length) > self.server.max_body_size:
+            status, message = 413, f'Body larger than {self.server.max_body_size} bytes\n'.encode()
+        else:
+            return int(length)
+        self.close_connection = True
+        self._send(status, 'text/plain', message)
+        return None
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else 'local'
+
+    def log_message(self, format, *args):
+        logging.info(f'serve: {self.address_string()} {format % args}')
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """ HTTP server converting tablatures in a pool of worker processes.
+    """
+    daemon_threads = True
+    # Function run by the workers: convert(text, writer) -> (converted, MusicXML or error message)
+    convert_function = staticmethod(convert_text)
+
+    def __init__(self, address, nb_workers=None, queue_size=16, request_timeout=60.0, writer='music21',
+                 max_body_size=1024 * 1024):
+        super().__init__(address, ConversionRequestHandler)
+        self.nb_workers = nb_workers or os.cpu_count()
+        self.request_timeout = request_timeout
+        self.writer = writer
+        # Largest request body accepted, in bytes
+        self.max_body_size = max_body_size
+        # Running + queued conversions
+        self.slots = threading.BoundedSemaphore(self.nb_workers + queue_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.nb_workers, initializer=init_worker)
+        self.warm_up()
+
+    def warm_up(self):
+        """ Start all the workers now (each one imports music21 when starting).
+        """
+        futures = [self.executor.submit(_ping) for _ in range(self.nb_workers)]
+        for future in futures:
+            future.result()
+
+    def convert(self, text, writer):
+        """ Return the HTTP status and body of a conversion request.
+        """
+        if not self.slots.acquire(blocking=False):
+            return 503, b'Too many requests, retry later\n'
+        try:
+            future = self.executor.submit(self.convert_function, text, writer)
+        except Exception:
+            self.slots.release()
+            raise
+        # The slot is released when the conversion is over, even after a timeout:
+        #   a running conversion cannot be interrupted
+        future.add_done_callback(lambda f: self.slots.release())
+        try:
+            converted, result = future.result(timeout=self.request_timeout)
+        except TimeoutError:
+            future.cancel()
+            return 504, b'Conversion timeout\n'
+        if not converted:
+            return 422, f'{result}\n'.encode()
+        return 200, result
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class UnixConversionServer(ConversionServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def parse_args(argv):
+    parser = ArgumentParser(prog='btab2mxml serve', description="Local tablature to MusicXML conversion service")
+    parser.add_argument("--host", default='127.0.0.1', help="Listening address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Listening port (default: 8080)")
+    parser.add_argument("--socket", type=Path, help="Listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=0, help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Number of requests waiting for a worker before answering 503 (default: 16)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Conversion timeout in seconds (default: 60)")
+    parser.add_argument("--max-body-size", type=int, default=1024 * 1024,
+                        help="Largest tablature accepted, in bytes (default: 1 MiB)")
+    parser.add_argument("--writer", choices=['music21', 'direct', 'stream'], default='music21',
+                        help="Default MusicXML writer (default: music21)")
+    parser.add_argument("--verbose", action='store_true', help="Log debug messages")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    options = dict(nb_workers=args.workers, queue_size=args.queue_size,
+                   request_timeout=args.timeout, writer=args.writer, max_body_size=args.max_body_size)
+    if args.socket:
+        if args.socket.exists():
+            args.socket.unlink()
+        server = UnixConversionServer(str(args.socket), **options)
+        logging.info(f'Serving on {args.socket} with {server.nb_workers} workers')
+    else:
+        server = ConversionServer((args.host, args.port), **options)
+        logging.info(f'Serving on http://{args.host}:{server.server_port} with {server.nb_workers} workers')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info('Server stopped')
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import logging
+import time
+
+
+class Watcher:
+    """ Polling watcher of files: reports the files created or modified once they have
+        not changed for debounce seconds (editors may write a file in several steps).
+    """
+    def __init__(self, get_files, interval=0.2, debounce=0.3):
+        # get_files() returns the paths to watch; called at each poll, so new files are seen
+        self.get_files = get_files
+        self.interval = interval
+        self.debounce = debounce
+        self.states = self._scan()
+        self.pending = {}
+
+    def _scan(self):
+        states = {}
+        for file_name in self.get_files():
+            try:
+                stat = file_name.stat()
+            except OSError:
+                # Removed meanwhile
+                continue
+            states[file_name] = (stat.st_mtime_ns, stat.st_size)
+        return states
+
+    def poll(self, now=None):
+        """ Return the files changed since the previous polls, and settled since then.
+        """
+        now = time.monotonic() if now is None else now
+        states = self._scan()
+        for file_name, state in states.items():
+            if self.states.get(file_name) != state:
+                self.pending[file_name] = now
+        for file_name in [f for f in self.pending if f not in states]:
+            del self.pending[file_name]
+        self.states = states
+        settled = sorted(f for f, changed in self.pending.items() if now - changed >= self.debounce)
+        for file_name in settled:
+            del self.pending[file_name]
+        return settled
+
+    def run(self, callback):
+        """ Call callback(files) with the settled changed files, until interrupted.
+            Errors are logged, and watching goes on.
+        """
+        while True:
+            try:
+                changed = self.poll()
+                if changed:
+                    callback(changed)
+            except Exception as e:
+                logging.error(f'Watch: {e}')
+            time.sleep(self.interval)
@@ -0,0 +1,117 @@
+""" Helpers shared by the test modules.
+"""
+from contextlib import contextmanager
+import io
+import logging
+import re
+import xml.etree.ElementTree as ET
+from fractions import Fraction
+from pathlib import Path
+from unittest.mock import MagicMock
+import music21
+from btab2mxml.btab.btab_parser import BtabParser
+from btab2mxml.btab.btab_reader import BtabReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.token import EndToken
+from btab2mxml.mxml.mxml_writer import MxmlWriter
+
+corpus = Path(__file__).parent.parent / 'tablatures' / '2112'
+
+
+@contextmanager
+def quiet():
+    """ Silence the warnings of the tablatures.
+    """
+    logging.disable(logging.WARNING)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def get_tokenizer(tokens):
+    """ Mock tokenizer returning the tokens.
+    """
+    tokenizer = MagicMock()
+    tokenizer.get_next_token.side_effect = tokens
+    return tokenizer
+
+
+def read_tokens(reader):
+    tokenizer = BtabTokenizer(reader)
+    tokens = [tokenizer.get_next_token()]
+    while not isinstance(tokens[-1], EndToken):
+        tokens.append(tokenizer.get_next_token())
+    return [(type(t), str(t.get_value())) for t in tokens]
+
+
+def parse(reader):
+    """ BtabParser which parsed the tablature of reader, quietly.
+    """
+    parser = BtabParser(BtabTokenizer(reader))
+    with quiet():
+        parser.parse()
+    return parser
+
+
+def parse_file(file_name):
+    return parse(BtabReader(file_name))
+
+
+def music21_xml(parser):
+    parser.score.insert(parser.bass)
+    return music21.musicxml.m21ToXml.GeneralObjectExporter(parser.score).parse()
+
+
+def direct_xml(parser):
+    output = io.BytesIO()
+    MxmlWriter(output).write(parser.score.metadata, parser.bass)
+    return output.getvalue()
+
+
+def normalize(xml):
+    """ MusicXML document without its encoding date and ids.
+    """
+    return re.sub(rb'<encoding-date>.*?</encoding-date>|id="[^"]*"', b'', xml)
+
+
+def summarize(xml):
+    """ Musical content of a MusicXML document, ignoring layout (beams, stems, ids, numbers).
+    """
+    root = ET.fromstring(xml)
+    summary = {
+        'title': root.findtext('work/work-title'),
+        'rights': root.findtext('identification/rights'),
+        'measures': [],
+    }
+    divisions = 1
+    for measure in root.iter('measure'):
+        divisions = int(measure.findtext('attributes/divisions', divisions))
+        notes = []
+        for note in measure.iter('note'):
+            pitch = note.find('pitch')
+            notes.append((
+                note.find('chord') is not None,
+                None if pitch is None else (pitch.findtext('step'), float(pitch.findtext('alter', 0)),
+                                            pitch.findtext('octave')),
+                Fraction(int(note.findtext('duration')), divisions),
+                note.findtext('type'),
+                len(note.findall('dot')),
+                (note.findtext('time-modification/actual-notes'), note.findtext('time-modification/normal-notes')),
+                [t.get('type') for t in note.findall('tie')],
+                [t.get('type') for t in note.findall('notations/tied')],
+                note.findtext('notehead'),
+                sorted(s.get('type') for s in note.findall('notations/slur')),
+                sorted(s.get('type') for s in note.findall('notations/slide')),
+                [t.get('type') for t in note.findall('notations/tuplet')],
+                sorted((t.tag, t.get('type'), t.text) for t in note.findall('notations/technical/*')),
+            ))
+        summary['measures'].append({
+            'number': measure.get('number'),
+            'time': [(t.findtext('beats'), t.findtext('beat-type')) for t in measure.iter('time')],
+            'barlines': [(b.get('location'), b.find('repeat').get('direction'))
+                         for b in measure.iter('barline') if b.find('repeat') is not None],
+            'words': sorted(w.text for w in measure.iter('words')),
+            'notes': notes,
+        })
+    return summary
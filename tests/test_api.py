@@ -0,0 +1,45 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from btab2mxml import convert
+from btab2mxml.main import convert_file
+from tests.helpers import corpus, normalize
+
+
+class TestConvert(unittest.TestCase):
+    def setUp(self):
+        self.file_name = corpus / '2112-soliloquy.btab'
+        self.text = self.file_name.read_text()
+
+    def converted_file(self, writer='music21'):
+        with tempfile.TemporaryDirectory() as tmp:
+            out_file = Path(tmp) / 'out.xml'
+            self.assertTrue(convert_file(self.file_name, out_file, writer=writer))
+            return out_file.read_bytes()
+
+    def test_sources(self):
+        expected = normalize(self.converted_file())
+        self.assertEqual(normalize(convert(self.text)), expected)
+        with open(self.file_name, 'rb') as f:
+            self.assertEqual(normalize(convert(f)), expected)
+        self.assertEqual(normalize(convert(self.text.splitlines())), expected)
+
+    def test_output(self):
+        for writer in ('music21', 'direct'):
+            with self.subTest(writer=writer):
+                expected = normalize(self.converted_file(writer))
+                binary = io.BytesIO()
+                self.assertIsNone(convert(self.text, binary, writer=writer))
+                self.assertEqual(normalize(binary.getvalue()), expected)
+                text = io.StringIO()
+                convert(io.StringIO(self.text), text, writer=writer)
+                self.assertEqual(normalize(text.getvalue().encode('utf-8')), expected)
+
+    def test_no_end_marker(self):
+        xml = convert('Rush: Test\n\n   q \n||---\n||-0-\n||---\n||---\n\n   q \n||---\n||-2-\n||---\n||---\n')
+        self.assertIn(b'<movement-title>Test</movement-title>', xml)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import asyncio
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from btab2mxml import convert
+from btab2mxml.async_api import AsyncConverter
+from tests.helpers import corpus, normalize
+
+
+class TestAsyncConverter(unittest.IsolatedAsyncioTestCase):
+    async def test_convert_files(self):
+        stems = ['2112-tears', 'missing', '2112-soliloquy']
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = [(corpus / f'{s}.btab', Path(tmp) / f'{s}.xml') for s in stems]
+            async with AsyncConverter(max_concurrency=2) as converter:
+                results = await converter.convert_files(jobs, writer='direct')
+            self.assertIsNone(results[0])
+            self.assertIsInstance(results[1], FileNotFoundError)
+            self.assertIsNone(results[2])
+            for in_file, out_file in (jobs[0], jobs[2]):
+                self.assertEqual(normalize(out_file.read_bytes()),
+                                 normalize(convert(in_file.read_text(), writer='direct')))
+
+    async def test_convert(self):
+        text = (corpus / '2112-tears.btab').read_text()
+        async with AsyncConverter(max_concurrency=2) as converter:
+            xml = await asyncio.gather(*(converter.convert(text) for _ in range(3)))
+        self.assertEqual(len(set(normalize(x) for x in xml)), 1)
+        self.assertEqual(normalize(xml[0]), normalize(convert(text)))
+
+    async def test_cancel(self):
+        text = (corpus / '2112-tears.btab').read_text()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            converter = AsyncConverter(max_concurrency=1, executor=executor)
+            first = asyncio.create_task(converter.convert(text))
+            second = asyncio.create_task(converter.convert(text))
+            await asyncio.sleep(0)
+            # The second conversion waits for the only slot
+            second.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await second
+            self.assertIn(b'<score-partwise', await first)
+            await converter.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
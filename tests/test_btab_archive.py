@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from pathlib import Path
+from btab2mxml.btab.btab_archive import ArchiveSong, index_archive
+from btab2mxml.btab.btab_reader import BtabReader, BtabMmapReader
+from tests.helpers import corpus, read_tokens
+
+
+class TestBtabArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.files = sorted(corpus.glob('*.btab'))
+        self.archive = Path(self.tmp.name) / 'archive.btab'
+        self.archive.write_bytes(b''.join(f.read_bytes() for f in self.files))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_index(self):
+        songs = index_archive(self.archive)
+        self.assertEqual(len(songs), len(self.files))
+        start = 0
+        for song, file_name in zip(songs, self.files):
+            size = file_name.stat().st_size
+            self.assertEqual((song.start, song.stop), (start, start + size))
+            self.assertEqual(song.first_line, self.archive.read_bytes()[:start].count(b'\n'))
+            start += size
+        self.assertEqual(songs[0].title, 'A Passage to Bangkok')
+        # Title line followed by 'By Rush'
+        self.assertEqual(songs[7].title, 'Tears')
+        self.assertEqual(songs[7].get_file_stem('archive'), 'archive-tears')
+
+    def test_same_tokens(self):
+        for song, file_name in zip(index_archive(self.archive), self.files):
+            with self.subTest(file=file_name.name):
+                reader = BtabMmapReader(self.archive, start=song.start, stop=song.stop)
+                self.assertEqual(read_tokens(reader), read_tokens(BtabReader(file_name)))
+
+    def test_song_without_title(self):
+        archive = Path(self.tmp.name) / 'untitled.btab'
+        archive.write_text('   q \n||---\n||-0-\n||---\n||---\nend\n'
+                           'Rush: Second\n\n   q \n||---\n||-2-\n||---\n||---\nend\n')
+        self.assertEqual(index_archive(archive),
+                         [ArchiveSong(None, 0, 34), ArchiveSong('Second', 34, 82, 6)])
+        self.assertEqual(index_archive(archive)[0].get_file_stem('untitled'), 'untitled')
+
+
+if __name__ == '__main__':
+    unittest.main()
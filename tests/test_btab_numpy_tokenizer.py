@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from btab2mxml.btab import btab_numpy_tokenizer
+from btab2mxml.btab.btab_numpy_tokenizer import create_tokenizer, numpy
+from btab2mxml.btab.btab_reader import BtabMmapReader, BtabReader, BtabTextReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from tests.helpers import corpus
+
+
+# Staff block spaced out with runs of blank columns
+spread_block = ('      q       e       e       h             \n'
+                '|------------------------------------------|\n'
+                '|-----0-------2-------3-------5------------|\n'
+                '|------------------------------------------|\n'
+                '|---------------------0--------------------|\n')
+spread_tab = 'Rush: Test\n\n' + '\n'.join([spread_block] * 20) + 'end\n'
+
+
+def token_values(tokenizer):
+    return [(t.__class__, str(t.get_value())) for t in tokenizer]
+
+
+@unittest.skipUnless(numpy, 'numpy is not installed')
+class TestBtabNumpyTokenizer(unittest.TestCase):
+    def test_same_tokens(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                self.assertEqual(token_values(create_tokenizer(BtabMmapReader(file_name), 'numpy')),
+                                 token_values(BtabTokenizer(BtabMmapReader(file_name))))
+
+    def test_spread_tab(self):
+        text = spread_tab
+        tokenizer = create_tokenizer(BtabTextReader(text), 'numpy')
+        self.assertIsInstance(tokenizer, btab_numpy_tokenizer.BtabNumpyTokenizer)
+        self.assertEqual(token_values(tokenizer), token_values(BtabTokenizer(BtabTextReader(text))))
+        # The blank columns are skipped: fewer columns are classified
+        reference = BtabTokenizer(BtabTextReader(text))
+        list(reference)
+        total = tokenizer.column_cache_info()
+        reference_total = reference.column_cache_info()
+        self.assertLess(total['hits'] + total['misses'], (reference_total['hits'] + reference_total['misses']) / 2)
+
+    def test_line_reader(self):
+        # Readers without staff block buffer are read column by column
+        file_name = corpus / '2112-tears.btab'
+        self.assertEqual(token_values(create_tokenizer(BtabReader(file_name), 'numpy')),
+                         token_values(BtabTokenizer(BtabMmapReader(file_name))))
+
+    def test_blank_columns(self):
+        block = ['   q  ', '|---2-', '|-----', '|----3', '|-----']
+        grid = numpy.array([list(line.encode()) for line in block], dtype=numpy.uint8)
+        blank = btab_numpy_tokenizer.get_blank_columns(grid, 4)
+        self.assertEqual(blank.tolist(), [False, True, True, False, False, False])
+        self.assertEqual(btab_numpy_tokenizer.get_skip_targets(blank).tolist(), [0, 3, 3, 3, 4, 5])
+        # No header row
+        self.assertFalse(btab_numpy_tokenizer.get_blank_columns(grid[1:], 4).any())
+
+
+class TestCreateTokenizer(unittest.TestCase):
+    def test_fallback(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = Path(tmp) / 'test.btab'
+            file_name.write_text(spread_tab)
+            with mock.patch.object(btab_numpy_tokenizer, 'numpy', None), self.assertLogs(level='WARNING'):
+                tokenizer = create_tokenizer(BtabMmapReader(file_name), 'numpy')
+            self.assertIs(type(tokenizer), BtabTokenizer)
+            self.assertIs(type(create_tokenizer(BtabMmapReader(file_name))), BtabTokenizer)
+
+
+if __name__ == '__main__':
+    unittest.main()
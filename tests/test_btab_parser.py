@@ -1,7 +1,9 @@
 import unittest
 from unittest.mock import MagicMock
+from btab2mxml.btab.btab_builder import BtabBuilder
 from btab2mxml.btab.btab_parser import BtabParser
 from btab2mxml.btab.token import *
+from tests.helpers import get_tokenizer
 import music21
 
 # Mock tokens to return values expected by the test
@@ -10,39 +12,33 @@ class MockNbStringsToken(NbStringsToken):
         return 4
 
 class MockNoteToken(NoteToken):
-    def get_value(self):
-        return ['q','', '', '0', '']
+    def __init__(self, *args):
+        super().__init__('q', (None, None, 0, None))
 
 class MockChordToken(NoteToken):
-    def get_value(self):
-        return ['w', '', '7', '0', '']
+    def __init__(self, *args):
+        super().__init__('w', (None, 7, 0, None))
 
 class MockChordWithGhostToken(NoteToken):
-    def get_value(self):
-        return ['w', '', '7', '0', 'x']
+    def __init__(self, *args):
+        super().__init__('w', (None, 7, 0, GHOST))
 
 class MockPullOffToken(PullOffToken):
     def get_value(self):
         return ''
     
 class MockGhostNoteToken(NoteToken):
-    def get_value(self):
-        return ['s', '', 'x', '', '']
+    def __init__(self, *args):
+        super().__init__('s', (None, GHOST, None, None))
 
 class MockCopyrightToken(CopyrightToken):
     def get_value(self):
         return 'Test copyright'
 
-# Create and return a mock tokenizer with given tokens
-def get_tokenzier(tokens):
-    mock_tokenizer = MagicMock()
-    mock_tokenizer.get_next_token.side_effect = tokens
-    return mock_tokenizer
-
 # Tests class
 class TestBtabParser(unittest.TestCase):
     def test_parse_single_note(self):
-        mock_tokenizer = get_tokenzier([
+        mock_tokenizer = get_tokenizer([
             MockNbStringsToken(),  # Strings number
             MeasureBarToken(),     # Start of measure
             MockNoteToken(),       # One note "q0"
@@ -62,7 +58,7 @@ class TestBtabParser(unittest.TestCase):
         self.assertEqual(int(note.pitch.ps), 45)
 
     def test_ghost_note(self):
-        mock_tokenizer = get_tokenzier([
+        mock_tokenizer = get_tokenizer([
             MockNbStringsToken(),
             MeasureBarToken(),
             MockGhostNoteToken(),
@@ -77,7 +73,7 @@ class TestBtabParser(unittest.TestCase):
 
 
     def test_chord(self):
-        mock_tokenizer = get_tokenzier([
+        mock_tokenizer = get_tokenizer([
             MockNbStringsToken(),  # Strings number
             MeasureBarToken(),     # Start measure
             MockChordToken(),      # One note "q0"
@@ -97,7 +93,7 @@ class TestBtabParser(unittest.TestCase):
         self.assertEqual(int(pitches[0].ps), 57)
         self.assertEqual(int(pitches[1].ps), 45)
 
-        mock_tokenizer = get_tokenzier([
+        mock_tokenizer = get_tokenizer([
             MockNbStringsToken(),  # Strings number
             MeasureBarToken(),     # Start measure
             MockChordWithGhostToken(),
@@ -116,7 +112,7 @@ class TestBtabParser(unittest.TestCase):
         self.assertEqual(notes[-1].notehead, 'x')
 
     def test_pull_off(self):
-        mock_tokenizer = get_tokenzier([
+        mock_tokenizer = get_tokenizer([
             MockNbStringsToken(),
             MeasureBarToken(),
             MockNoteToken(),
@@ -128,7 +124,7 @@ class TestBtabParser(unittest.TestCase):
         parser.parse()
 
     def test_copyright(self):
-        mock_tokenizer = get_tokenzier([
+        mock_tokenizer = get_tokenizer([
             MockCopyrightToken(),
             EndToken()             # End
         ])
@@ -138,7 +134,7 @@ class TestBtabParser(unittest.TestCase):
         self.assertEqual(parser.score.metadata.copyright, 'Translation copyright: Test copyright')
 
     def test_bend(self):
-        mock_tokenizer = get_tokenzier([
+        mock_tokenizer = get_tokenizer([
             MockNbStringsToken(),
             MeasureBarToken(),
             MockNoteToken(),
@@ -156,6 +152,66 @@ class TestBtabParser(unittest.TestCase):
         self.assertEqual(len(expr), 1)
         self.assertEqual(expr[0].content, '~')
 
+    def test_register_token_handler(self):
+        class FermataToken(Token): pass
+
+        class FermataParser(BtabParser): pass
+
+        def handle_fermata(parser, token):
+            parser.current_note.expressions.append(music21.expressions.Fermata())
+
+        FermataParser.register_token_handler(FermataToken, handle_fermata)
+        self.assertNotIn(FermataToken, BtabParser.token_handlers)
+
+        parser = FermataParser(get_tokenizer([
+            MockNbStringsToken(),
+            MeasureBarToken(),
+            MockNoteToken(),
+            FermataToken(),
+            EndToken()
+        ]))
+        parser.parse()
+
+        note = list(parser.current_measure.notes)[0]
+        self.assertEqual(int(note.pitch.ps), 45)
+        self.assertIsInstance(note.expressions[0], music21.expressions.Fermata)
+
+    def test_builder_hooks_required(self):
+        class TitleBuilder(BtabBuilder):
+            def _set_title(self, title):
+                self.title = title
+
+        with self.assertRaises(TypeError):
+            TitleBuilder(get_tokenizer([EndToken()]))
+
+    def test_unknown_token_ignored(self):
+        class UnknownToken(Token): pass
+
+        parser = BtabParser(get_tokenizer([
+            MockNbStringsToken(),
+            MeasureBarToken(),
+            UnknownToken(),
+            MockNoteToken(),
+            EndToken()
+        ]))
+        parser.parse()
+
+        self.assertEqual(len(parser.current_measure.notes), 1)
+
+    def test_rest_before_measure_bar(self):
+        parser = BtabParser(get_tokenizer([
+            MockNbStringsToken(),
+            RestToken(['q']),
+            MeasureBarToken(),
+            MockNoteToken(),
+            EndToken()
+        ]))
+        with self.assertLogs(level='ERROR') as log:
+            parser.parse()
+
+        self.assertEqual(log.output, ['ERROR:root:RestToken before the first measure bar'])
+        self.assertEqual(len(parser.current_measure.notes), 1)
+
 class TestBtabParserMeasureOverflow(unittest.TestCase):
     def test_measure_duration_overflow_warning(self):
         # 5 notes 'q0' (quarter notes) = 5 * 1/4 = 1.25 > 1.0 (4/4)
@@ -179,6 +235,36 @@ class TestBtabParserMeasureOverflow(unittest.TestCase):
 
         self.assertTrue(any("Duration of measure" in msg for msg in log.output))
 
+    def parse_measure(self, notes):
+        tokenizer = get_tokenizer([MockNbStringsToken(), MeasureBarToken(), *notes, MeasureBarToken(), EndToken()])
+        parser = BtabParser(tokenizer)
+        parser.parse()
+        return parser
+
+    def test_triplets_exact(self):
+        # 6 triplet eighths + quarter + dotted 16th + 32nd + 2 dotted 32nd + 32nd = 4/4
+        triplet = [NoteToken('e', (None, None, 0, None)), TrioletToken()]
+        notes = triplet * 6 + [NoteToken(d, (None, None, 0, None)) for d in 'qStTTt']
+        with self.assertNoLogs(level='WARNING'):
+            parser = self.parse_measure(notes)
+        self.assertEqual(parser.bass.getElementsByClass(music21.stream.Measure)[0].duration.quarterLength, 4)
+
+    def test_triplets_mismatch(self):
+        triplet = [NoteToken('e', (None, None, 0, None)), TrioletToken()]
+        with self.assertLogs(level='WARNING') as log:
+            self.parse_measure(triplet * 5)
+        self.assertEqual(log.output, ['WARNING:root:Duration of measure 1: 5/3, time signature is 4/4'])
+
+
+    def test_double_triplet(self):
+        # The second triplet mark of the same note is ignored: 3 triplet eighths + 3 quarters = 4/4
+        triplet = [NoteToken('e', (None, None, 0, None)), TrioletToken()]
+        notes = triplet * 2 + [NoteToken('e', (None, None, 0, None)), TrioletToken(), TrioletToken()]
+        notes += [NoteToken('q', (None, None, 0, None))] * 3
+        with self.assertLogs(level='WARNING') as log:
+            parser = self.parse_measure(notes)
+        self.assertEqual(log.output, ['WARNING:root:Note already in a triplet (measure 1)'])
+        self.assertEqual(parser.bass.getElementsByClass(music21.stream.Measure)[0].duration.quarterLength, 4)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from pathlib import Path
+from btab2mxml.btab.btab_reader import BtabReader, BtabBlockReader, BtabMmapReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.token import *
+from tests.helpers import corpus, read_tokens
+
+
+def read_symbols(reader):
+    symbols = []
+    symbol = reader.get_next_score_symbol()
+    while symbol is not None:
+        symbols.append(symbol)
+        symbol = reader.get_next_score_symbol()
+    return symbols
+
+
+class TestBtabBlockReader(unittest.TestCase):
+    def test_same_symbols(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                self.assertEqual(read_symbols(BtabBlockReader(file_name)),
+                                 read_symbols(BtabReader(file_name)))
+
+    def test_streamed_tokens(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                streamed = [(type(t), str(t.get_value())) for t in BtabTokenizer(BtabReader(file_name))]
+                self.assertEqual(streamed, read_tokens(BtabReader(file_name)))
+
+    def test_same_tokens(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                self.assertEqual(read_tokens(BtabBlockReader(file_name)),
+                                 read_tokens(BtabReader(file_name)))
+
+
+class TestBtabMmapReader(unittest.TestCase):
+    def test_same_symbols(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                self.assertEqual(read_symbols(BtabMmapReader(file_name)),
+                                 read_symbols(BtabReader(file_name)))
+
+    def test_same_tokens(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                self.assertEqual(read_tokens(BtabMmapReader(file_name)),
+                                 read_tokens(BtabReader(file_name)))
+
+    def test_crlf(self):
+        file_name = sorted(corpus.glob('*.btab'))[0]
+        with tempfile.TemporaryDirectory() as tmp:
+            crlf_file = Path(tmp) / 'crlf.btab'
+            crlf_file.write_bytes(file_name.read_bytes().replace(b'\n', b'\r\n'))
+            self.assertEqual(read_tokens(BtabMmapReader(crlf_file)),
+                             read_tokens(BtabReader(file_name)))
+
+    def test_no_end_marker(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = Path(tmp) / 'no_end.btab'
+            file_name.write_text('Rush: Test\n\n   q \n||---\n||-0-\n||---\n||---\n')
+            tokens = read_tokens(BtabMmapReader(file_name))
+            self.assertEqual(tokens[0], (TitleToken, 'Test'))
+            self.assertEqual(tokens[-1][0], EndToken)
+
+    def test_empty_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = Path(tmp) / 'empty.btab'
+            file_name.write_text('')
+            self.assertEqual(read_tokens(BtabMmapReader(file_name)), [(EndToken, 'End')])
+
+    def test_read_in_memory(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                self.assertEqual(read_tokens(BtabMmapReader(file_name, use_mmap=False)),
+                                 read_tokens(BtabReader(file_name)))
+
+    def test_close(self):
+        file_name = sorted(corpus.glob('*.btab'))[0]
+        with BtabMmapReader(file_name) as reader:
+            self.assertIsNotNone(reader.get_next_score_symbol())
+        self.assertTrue(reader.data.closed)
+        # Closing twice, or an unmapped reader, is harmless
+        reader.close()
+        with BtabMmapReader(file_name, use_mmap=False) as reader:
+            self.assertIsInstance(reader.data, bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
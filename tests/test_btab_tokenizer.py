@@ -4,6 +4,13 @@ import unittest
 from btab2mxml.btab.btab_tokenizer import BtabTokenizer
 from btab2mxml.btab.token import *
 
+
+def note_value(symbols):
+    """ Compact NoteToken value of the tablature strings of a note.
+    """
+    frets = tuple(None if s == '' else GHOST if s == 'x' else int(s) for s in symbols[1:])
+    return (symbols[0], frets)
+
 test_header = \
 "Last Updated 5-8-12 \n" \
 "\n" \
@@ -325,6 +332,27 @@ bend_test = [
     (bend_tab, bend_tokens),
 ]
 
+# Regression: the bars of 5-string tabs ('|||||') used to be read as frets
+five_strings_tab = \
+"   q q   q q  \n" \
+"||-----|-----||\n" \
+"||-----|-----||\n" \
+"||-2---|-----||\n" \
+"||---0-|-----||\n" \
+"||-----|-0-2-||\n"
+five_strings_tokens = [
+    (MeasureBarToken, None),
+    (NoteToken, ['q', '', '', '2', '', '']),
+    (NoteToken, ['q', '', '', '', '0', '']),
+    (MeasureBarToken, None),
+    (NoteToken, ['q', '', '', '', '', '0']),
+    (NoteToken, ['q', '', '', '', '', '2']),
+    (MeasureBarToken, None),
+]
+five_strings_test = [
+    (five_strings_tab, five_strings_tokens),
+]
+
 # Mock reader
 class MockReader:
     def __init__(self, header = '', staff_lines=''):
@@ -391,8 +419,11 @@ class TestBtabTokenizer(unittest.TestCase):
             self.assertSequenceEqual([t[0] for t in test_def[1]],
                                 [t.__class__ for t in tokens])
             for test_index in range(len(test_def[1])):
-                if test_def[1][test_index][1] is not None:
-                    self.assertEqual(test_def[1][test_index][1], tokens[test_index].get_value())
+                expected = test_def[1][test_index][1]
+                if expected is not None:
+                    if test_def[1][test_index][0] is NoteToken:
+                        expected = note_value(expected)
+                    self.assertEqual(expected, tokens[test_index].get_value())
 
     def test_multi_measure_bar(self):
         self._test_token([double_measure_bar])
@@ -441,5 +472,37 @@ class TestBtabTokenizer(unittest.TestCase):
     def test_bend(self):
         self._test_token(bend_test)
 
+    def test_five_strings(self):
+        self._test_token(five_strings_test)
+
+    def test_iterator(self):
+        for tab in (test_notes_tab, test_repeat2_tab, ghost_tab, gliss_under_tie_tab):
+            tokenizer = BtabTokenizer(MockReader(test_header, tab))
+            expected = [tokenizer.get_next_token()]
+            while not isinstance(expected[-1], EndToken):
+                expected.append(tokenizer.get_next_token())
+            streamed = list(BtabTokenizer(MockReader(test_header, tab)))
+            self.assertSequenceEqual([(t.__class__, str(t.get_value())) for t in expected],
+                                     [(t.__class__, str(t.get_value())) for t in streamed])
+
+    def test_column_cache(self):
+        BtabTokenizer.column_classes.clear()
+        tokenizer = BtabTokenizer(MockReader(test_header, test_notes_tab))
+        tokens = [(t.__class__, str(t.get_value())) for t in tokenizer]
+        info = tokenizer.column_cache_info()
+        self.assertEqual(info['misses'], len(BtabTokenizer.column_classes[4]))
+        self.assertGreater(info['hits'], 0)
+        # Same tokens when the columns are classified again, or the table is full
+        for cache_size in (4096, 0):
+            BtabTokenizer.column_classes.clear()
+            BtabTokenizer.column_cache_size = cache_size
+            try:
+                tokenizer = BtabTokenizer(MockReader(test_header, test_notes_tab))
+                self.assertSequenceEqual([(t.__class__, str(t.get_value())) for t in tokenizer], tokens)
+            finally:
+                BtabTokenizer.column_cache_size = 4096
+        self.assertEqual(tokenizer.column_cache_info()['hits'], 0)
+        self.assertEqual(BtabTokenizer.column_classes[4], {})
+
 if __name__ == '__main__':
     unittest.main()
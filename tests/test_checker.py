@@ -0,0 +1,89 @@
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+from btab2mxml.btab.btab_reader import BtabTextReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.btab_archive import index_archive
+from btab2mxml.checker import BtabChecker, check_file
+from btab2mxml.main import main
+from tests.helpers import corpus
+
+
+def check_text(text):
+    return BtabChecker(BtabTokenizer(BtabTextReader(text)), 'test.btab').check()
+
+
+def tab(*blocks):
+    return 'Rush: Test\n\n' + '\n'.join(blocks) + 'end\n'
+
+
+class TestBtabChecker(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(check_file(corpus / '2112-tears.btab'), [])
+        self.assertEqual(check_text(tab('   w    w  \n|----|----|\n|--0-|--2-|\n|----|----|\n|----|----|\n')), [])
+
+    def test_measure_duration(self):
+        diagnostics = check_text(tab('   q    w  \n|----|----|\n|--0-|--2-|\n|----|----|\n|----|----|\n'))
+        self.assertEqual([(d.severity, d.code, d.line) for d in diagnostics], [('warning', 'measure-duration', 3)])
+        self.assertIn('Duration of measure 1: 1.0', diagnostics[0].message)
+
+    def test_invalid_duration_and_pitch(self):
+        diagnostics = check_text(tab('   w    w  \n|----|----|\n|--0-|--2-|\n|----|----|\n|----|----|\n',
+                                     '   x    w  \n|----|----|\n|--0-|--X-|\n|----|----|\n|----|----|\n'))
+        self.assertEqual([(d.severity, d.code, d.line) for d in diagnostics],
+                         [('error', 'invalid-duration', 9), ('error', 'invalid-pitch', 9)])
+        self.assertEqual([d.column for d in diagnostics], [5, 10])
+
+    def test_dangling_tie(self):
+        diagnostics = check_text(tab('   h    h  \n|---------|\n|--0------|\n|---------|\n|---------|\n'))
+        self.assertEqual(diagnostics[0].code, 'dangling-tie')
+        self.assertEqual(diagnostics[0].format(),
+                         f'test.btab:3:{diagnostics[0].column}: error: continued note (measure 1) [dangling-tie]')
+
+    def test_archive_song(self):
+        first = tab('   w    w  \n|----|----|\n|--0-|--2-|\n|----|----|\n|----|----|\n')
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = Path(tmp) / 'archive.btab'
+            archive.write_text(first + tab('   q    w  \n|----|----|\n|--0-|--2-|\n|----|----|\n|----|----|\n'))
+            song = index_archive(archive)[1]
+            diagnostics = check_file(archive, song)
+        # Line in the archive
+        self.assertEqual([d.line for d in diagnostics], [first.count('\n') + 3])
+
+    def test_fatal(self):
+        with mock.patch.object(BtabTokenizer, 'score', side_effect=IndexError('broken')):
+            diagnostics = check_text(tab('   w \n|----\n|--0-\n|----\n|----\n'))
+        self.assertEqual([(d.severity, d.code, d.message) for d in diagnostics],
+                         [('error', 'fatal', 'IndexError: broken')])
+
+
+class TestCheckMode(unittest.TestCase):
+    def run_main(self, *args):
+        output = io.StringIO()
+        with mock.patch('sys.argv', ['btab2mxml', '--check', *args]), redirect_stdout(output):
+            with self.assertRaises(SystemExit) as exit:
+                main()
+        return exit.exception.code, output.getvalue()
+
+    def test_exit_status(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            warning = Path(tmp) / 'warning.btab'
+            warning.write_text(tab('   q    w  \n|----|----|\n|--0-|--2-|\n|----|----|\n|----|----|\n'))
+            error = Path(tmp) / 'error.btab'
+            error.write_text(tab('   w    x  \n|----|----|\n|--0-|--2-|\n|----|----|\n|----|----|\n'))
+
+            self.assertEqual(self.run_main('--infile', str(corpus / '2112-tears.btab')), (0, ''))
+            status, output = self.run_main('--infile', str(warning))
+            self.assertEqual(status, 0)
+            self.assertTrue(output.startswith(f'{warning}:3:'))
+            self.assertEqual(self.run_main('--strict', '--infile', str(warning))[0], 1)
+            status, output = self.run_main('--indir', tmp)
+            self.assertEqual(status, 1)
+            self.assertEqual([line.split(':')[0] for line in output.splitlines()], [str(error), str(warning)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+from btab2mxml.conversion_cache import ConversionCache
+
+
+class TestConversionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmpdir.name)
+        self.in_file = self.dir / 'song.btab'
+        self.in_file.write_text('Rush: Song\n')
+        self.out_file = self.dir / 'song.xml'
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key(self):
+        key = ConversionCache.get_key(self.in_file, {'writer': 'music21'})
+        self.assertEqual(key, ConversionCache.get_key(self.in_file, {'writer': 'music21'}))
+        self.assertNotEqual(key, ConversionCache.get_key(self.in_file, {'writer': 'direct'}))
+        self.in_file.write_text('Rush: Edited song\n')
+        self.assertNotEqual(key, ConversionCache.get_key(self.in_file, {'writer': 'music21'}))
+
+    def test_status(self):
+        cache = ConversionCache(self.dir)
+        self.assertEqual(cache.get_status(self.out_file, 'k1'), 'unknown')
+        cache.set(self.out_file, 'k1')
+        # Output file not written yet
+        self.assertEqual(cache.get_status(self.out_file, 'k1'), 'unknown')
+        self.out_file.write_text('<score-partwise />')
+        self.assertEqual(cache.get_status(self.out_file, 'k1'), 'fresh')
+        self.assertEqual(cache.get_status(self.out_file, 'k2'), 'stale')
+
+    def test_outputs_status(self):
+        cache = ConversionCache(self.dir)
+        mid_file = self.dir / 'song.mid'
+        for out_file in (self.out_file, mid_file):
+            cache.set(out_file, 'k1')
+            out_file.write_text('')
+        self.assertEqual(cache.get_outputs_status([self.out_file, mid_file], 'k1'), 'fresh')
+        # One of the outputs deleted, or built from other options
+        mid_file.unlink()
+        self.assertEqual(cache.get_outputs_status([self.out_file, mid_file], 'k1'), 'unknown')
+        mid_file.write_text('')
+        cache.set(mid_file, 'k2')
+        self.assertEqual(cache.get_outputs_status([self.out_file, mid_file], 'k1'), 'stale')
+
+    def test_persistence(self):
+        cache = ConversionCache(self.dir)
+        cache.set(self.out_file, 'k1')
+        cache.save()
+        self.out_file.write_text('<score-partwise />')
+        cache = ConversionCache(self.dir)
+        self.assertEqual(cache.get_status(self.out_file, 'k1'), 'fresh')
+        cache.remove(self.out_file)
+        cache.save()
+        self.assertEqual(ConversionCache(self.dir).get_status(self.out_file, 'k1'), 'unknown')
+
+    def test_invalid_manifest(self):
+        (self.dir / ConversionCache.file_name).write_text('not json')
+        with self.assertLogs(level='WARNING'):
+            cache = ConversionCache(self.dir)
+        self.assertEqual(cache.entries, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import unittest
+
+
+def imported_modules(code):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    return set(line.split('|')[-1].strip() for line in result.stderr.splitlines()
+               if line.startswith('import time:'))
+
+
+class TestImportTime(unittest.TestCase):
+    def test_no_music21_for_cli_and_tokenizer(self):
+        for module in ('btab2mxml.main', 'btab2mxml.btab.btab_tokenizer', 'btab2mxml.ir.ir_builder'):
+            with self.subTest(module=module):
+                self.assertNotIn('music21', imported_modules(f'import {module}'))
+
+    def test_no_music21_for_help(self):
+        code = 'import sys; sys.argv = ["btab2mxml", "--help"]; from btab2mxml.main import main; main()'
+        modules = imported_modules(code)
+        self.assertNotIn('music21', modules)
+        self.assertNotIn('numpy', modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
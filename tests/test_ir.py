@@ -0,0 +1,83 @@
+import io
+import unittest
+from btab2mxml.btab.btab_parser import BtabParser
+from btab2mxml.btab.btab_reader import BtabReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.token import *
+from btab2mxml.ir.ir import IrNote, measure_rest_codes, quarter_length, time_signature_ticks
+from btab2mxml.ir.ir_builder import IrBuilder
+from btab2mxml.ir.ir_lowering import lower_to_music21
+from btab2mxml.mxml.mxml_writer import MxmlWriter
+from tests.helpers import corpus, direct_xml, get_tokenizer, parse_file, quiet, summarize
+
+
+class TestIrBuilder(unittest.TestCase):
+    def test_notes(self):
+        song = IrBuilder(get_tokenizer([
+            NbStringsToken(4),
+            MeasureBarToken(),
+            NoteToken.from_symbols(['q', '', '', '0', '']),
+            NoteToken.from_symbols(['w', '', '7', '0', 'x']),
+            TrioletToken(),
+            TieToken(),
+            TiedNoteToken('e'),
+            MeasureBarToken(),
+            EndToken()
+        ])).build()
+
+        self.assertEqual(song.nb_strings, 4)
+        self.assertEqual(len(song.measures), 1)
+        note, chord, tied = song.measures[0].notes
+        self.assertEqual((note.code, note.duration, note.pitches), ('q', 96, (45,)))
+        self.assertEqual(chord.pitches, (57, 45, 40))
+        self.assertEqual(chord.ghosts, (False, False, True))
+        self.assertTrue(chord.triplet)
+        self.assertTrue(chord.tie)
+        self.assertEqual(tied.pitches, chord.pitches)
+        self.assertEqual(song.measures[0].ticks(), 96 + 384 * 2 // 3 + 48)
+
+    def test_measure_duration_warning(self):
+        tokens = [NbStringsToken(4), MeasureBarToken()]
+        tokens += [NoteToken.from_symbols(['q', '', '', '0', '']) for _ in range(5)]
+        tokens += [MeasureBarToken(), EndToken()]
+        with self.assertLogs(level='WARNING') as log:
+            IrBuilder(get_tokenizer(tokens)).build()
+        self.assertTrue(any("Duration of measure" in msg for msg in log.output))
+
+    def test_ticks(self):
+        self.assertEqual(IrNote('e', 48, triplet=True).ticks() * 3, IrNote('q', 96).ticks())
+        self.assertEqual(time_signature_ticks('13/8'), 13 * 48)
+        self.assertEqual(measure_rest_codes('13/8'), ['W', 'e'])
+        self.assertEqual(quarter_length(144), 1.5)
+        self.assertEqual(str(quarter_length(160)), '5/3')
+
+    def test_double_triplet(self):
+        tokens = [NbStringsToken(4), MeasureBarToken(), NoteToken.from_symbols(['q', '', '', '0', '']),
+                  TrioletToken(), TrioletToken(), MeasureBarToken(), EndToken()]
+        with self.assertLogs(level='WARNING') as log:
+            song = IrBuilder(get_tokenizer(tokens)).build()
+        self.assertIn('Note already in a triplet (measure 1)', log.output[0])
+        self.assertEqual(song.measures[0].ticks(), 64)
+
+
+    def test_same_handlers_as_parser(self):
+        self.assertIs(IrBuilder.token_handlers, BtabParser.token_handlers)
+
+
+class TestIrLowering(unittest.TestCase):
+    def setUp(self):
+        self.maxDiff = None
+
+    def test_same_score_as_parser(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                with quiet():
+                    song = IrBuilder(BtabTokenizer(BtabReader(file_name))).build()
+                score = lower_to_music21(song)
+                output = io.BytesIO()
+                MxmlWriter(output).write(score.metadata, score.parts[0])
+                self.assertEqual(summarize(output.getvalue()), summarize(direct_xml(parse_file(file_name))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import tempfile
+import unittest
+from pathlib import Path
+from btab2mxml.main import ConversionJob, convert_parallel
+from tests.helpers import corpus
+
+
+class TestConvertParallel(unittest.TestCase):
+    def test_failures_isolated_and_logs_ordered(self):
+        with tempfile.TemporaryDirectory() as outdir:
+            outdir = Path(outdir)
+            stems = ['2112-tears', 'missing', '2112-soliloquy']
+            jobs = [ConversionJob(corpus / f'{s}.btab', outdir / f'{s}.xml') for s in stems]
+            with self.assertLogs(level='INFO') as log:
+                results = convert_parallel(jobs, 2)
+
+            self.assertEqual(results, [True, False, True])
+            self.assertTrue((outdir / '2112-tears.xml').exists())
+            self.assertTrue((outdir / '2112-soliloquy.xml').exists())
+            conversions = [msg for msg in log.output if 'Conversion :' in msg]
+            self.assertEqual([s for m in conversions for s in stems if f'{s}.btab' in m], stems)
+            self.assertTrue(any('missing.btab' in msg for msg in log.output if msg.startswith('ERROR')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import io
+import unittest
+import music21
+from btab2mxml.btab.btab_reader import BtabReader, BtabTextReader
+from btab2mxml.midi.midi_writer import MidiWriter
+from tests.helpers import corpus, parse
+
+
+def read_midi(parser):
+    output = io.BytesIO()
+    MidiWriter(output).write(parser.score.metadata, parser.bass)
+    midi_file = music21.midi.MidiFile()
+    midi_file.readstr(output.getvalue())
+    return midi_file
+
+
+def note_events(midi_file):
+    """ (tick, 'on'/'off', pitch) of the notes of the track.
+    """
+    tick = 0
+    events = []
+    for event in midi_file.tracks[0].events:
+        if event.isDeltaTime():
+            tick += event.time
+        elif event.isNoteOn():
+            events.append((tick, 'on', event.pitch))
+        elif event.isNoteOff():
+            events.append((tick, 'off', event.pitch))
+    return events
+
+
+class TestMidiWriter(unittest.TestCase):
+    def test_corpus(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                parser = parse(BtabReader(file_name))
+                midi_file = read_midi(parser)
+                self.assertEqual(midi_file.ticksPerQuarterNote, MidiWriter.ticks_per_quarter)
+                events = note_events(midi_file)
+                # Each note on has its note off
+                self.assertEqual(sum(1 for e in events if e[1] == 'on'), sum(1 for e in events if e[1] == 'off'))
+                pitches = set(n.pitch.midi for n in parser.bass.recurse().notes
+                              for n in (n.notes if isinstance(n, music21.chord.Chord) else [n]))
+                self.assertEqual(set(e[2] for e in events), pitches)
+
+    def test_tie_and_timing(self):
+        text = ('Rush: Test\n\n'
+                '   h+  h     q  q  h     w   \n'
+                '|---------|-----------|-----|\n'
+                '|---------|-----------|-----|\n'
+                '|--2------|--3--x--0--|--0--|\n'
+                '|---------|-----------|-----|\n'
+                'end\n')
+        parser = parse(BtabTextReader(text))
+        events = note_events(read_midi(parser))
+        tpq = MidiWriter.ticks_per_quarter
+        # The tied half notes are one whole note, the ghost note is not dropped
+        self.assertEqual(events[:2], [(0, 'on', 47), (4 * tpq, 'off', 47)])
+        self.assertEqual([e[:2] for e in events[2:]], [(4 * tpq, 'on'), (5 * tpq, 'off'), (5 * tpq, 'on'),
+                                                       (6 * tpq, 'off'), (6 * tpq, 'on'), (8 * tpq, 'off'),
+                                                       (8 * tpq, 'on'), (12 * tpq, 'off')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from btab2mxml.btab import music21_factory
+from btab2mxml.btab.music21_factory import MyPitch
+
+
+class TestMusic21Factory(unittest.TestCase):
+    def setUp(self):
+        music21_factory.clear_cache()
+
+    def test_pitch(self):
+        pitch = music21_factory.get_pitch(3, 2)
+        self.assertIsInstance(pitch, MyPitch)
+        self.assertEqual(pitch.nameWithOctave, 'F#2')
+        self.assertFalse(pitch.ghost)
+        ghost = music21_factory.get_pitch(2, 0, ghost=True)
+        self.assertEqual(ghost.nameWithOctave, 'A2')
+        self.assertTrue(ghost.ghost)
+
+    def test_pitch_copies(self):
+        first = music21_factory.get_pitch(3, 2)
+        first.accidental.displayStatus = True
+        first.microtone = 20
+        second = music21_factory.get_pitch(3, 2)
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.accidental, second.accidental)
+        self.assertIsNone(second.accidental.displayStatus)
+        self.assertEqual(second.microtone.cents, 0)
+        self.assertEqual(second.ps, 42)
+
+    def test_duration_copies(self):
+        first = music21_factory.get_duration('eighth', 1)
+        self.assertEqual(first.quarterLength, 0.75)
+        first.quarterLength = first.quarterLength * 2 / 3
+        second = music21_factory.get_duration('eighth', 1)
+        self.assertEqual(second.quarterLength, 0.75)
+        self.assertEqual(second.dots, 1)
+
+    def test_clear_cache(self):
+        music21_factory.get_duration('quarter')
+        music21_factory.clear_cache()
+        self.assertEqual(music21_factory.cache_info()['durations'].currsize, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import io
+import unittest
+import xml.etree.ElementTree as ET
+import music21
+from btab2mxml.btab.btab_reader import BtabReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.btab_parser import BtabParser
+from btab2mxml.btab.token import *
+from tests.helpers import corpus, direct_xml, get_tokenizer, music21_xml, parse_file, quiet, summarize
+
+
+class TestMxmlWriter(unittest.TestCase):
+    def setUp(self):
+        self.maxDiff = None
+
+    def test_equivalent_to_music21(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                expected = summarize(music21_xml(parse_file(file_name)))
+                self.assertEqual(summarize(direct_xml(parse_file(file_name))), expected)
+
+    def test_ghost_note(self):
+        parser = parse_file(corpus / '2112-tears.btab')
+        note = next(iter(parser.bass.recurse().getElementsByClass(music21.note.Note)))
+        note.notehead = 'x'
+        root = ET.fromstring(direct_xml(parser))
+        self.assertEqual([n.text for n in root.iter('notehead')], ['x'])
+
+
+    def test_notations(self):
+        # Triplet of a chord and two notes, the chord hammered on the next note, then a slide
+        parser = BtabParser(get_tokenizer([
+            NbStringsToken(4),
+            MeasureBarToken(),
+            NoteToken('e', (None, None, 3, 3)), TrioletToken(), HammerOnToken(),
+            NoteToken('e', (None, None, 5, None)), TrioletToken(),
+            NoteToken('e', (None, None, 7, None)), TrioletToken(), GlissUpToken(),
+            NoteToken('h', (None, None, 9, None)),
+            NoteToken('q', (None, None, 9, None)),
+            MeasureBarToken(),
+            EndToken()
+        ]))
+        parser.parse()
+        notes = ET.fromstring(direct_xml(parser)).findall('.//note')
+        notations = [sorted(e.tag for e in note.iter() if e.tag in ('slur', 'slide', 'hammer-on', 'tuplet'))
+                     for note in notes]
+        self.assertEqual(notations, [['hammer-on', 'slur', 'tuplet'], [], ['hammer-on', 'slur'],
+                                     ['slide', 'tuplet'], ['slide'], []])
+        self.assertEqual([t.get('type') for t in notes[0].iter('tuplet')], ['start'])
+        self.assertEqual([t.get('type') for t in notes[3].iter('tuplet')], ['stop'])
+        self.assertEqual([(h.get('type'), h.text) for n in notes for h in n.iter('hammer-on')],
+                         [('start', 'H'), ('stop', None)])
+
+
+class TestStreamingWriter(unittest.TestCase):
+    def stream_xml(self, file_name):
+        parser = BtabParser(BtabTokenizer(BtabReader(file_name)))
+        output = io.BytesIO()
+        with quiet():
+            parser.parse_streaming(output)
+        return parser, output.getvalue()
+
+    def test_same_as_direct(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                parser, xml = self.stream_xml(file_name)
+                self.assertEqual(xml, direct_xml(parse_file(file_name)))
+                # The measures are not kept
+                self.assertEqual(len(parser.bass.getElementsByClass(music21.stream.Measure)), 0)
+                self.assertIsNone(parser.writer)
+
+    def test_convert(self):
+        from btab2mxml.api import convert
+        text = (corpus / '2112-tears.btab').read_text()
+        self.assertEqual(convert(text, writer='stream'), convert(text, writer='direct'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import json
+import tempfile
+import unittest
+from argparse import ArgumentTypeError
+from pathlib import Path
+from unittest import mock
+from btab2mxml.btab.btab_parser import BtabParser_ExportException
+from btab2mxml.main import convert_file, parse_args
+from btab2mxml.output_formats import get_output_files, parse_formats
+from tests.helpers import corpus, parse_file
+
+
+class TestOutputFormats(unittest.TestCase):
+    def test_parse_formats(self):
+        self.assertEqual(parse_formats('musicxml'), ['musicxml'])
+        self.assertEqual(parse_formats('midi, JSON,midi'), ['midi', 'json'])
+        with self.assertRaises(ArgumentTypeError):
+            parse_formats('musicxml,pdf')
+
+    def test_output_files(self):
+        self.assertEqual(get_output_files(Path('out/song.xml'), ['musicxml', 'midi', 'json']),
+                         {'musicxml': Path('out/song.xml'), 'midi': Path('out/song.mid'), 'json': Path('out/song.json')})
+
+    def test_json(self):
+        parser = parse_file(corpus / '2112-tears.btab')
+        output = io.BytesIO()
+        parser.output(output, output_format='json')
+        document = json.loads(output.getvalue())
+        self.assertEqual(document['title'], parser.score.metadata.title)
+        self.assertEqual(len(document['measures']), len(parser.bass.getElementsByClass('Measure')))
+        note = next(n for m in document['measures'] for n in m['notes'] if not n['rest'])
+        self.assertEqual(set(note), {'offset', 'duration', 'type', 'dots', 'triplet', 'rest', 'pitches', 'tie'})
+        self.assertEqual(set(note['pitches'][0]), {'name', 'midi', 'ghost'})
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def outputs(self, name):
+        return get_output_files(self.dir / f'{name}.xml', ['musicxml', 'midi', 'json'])
+
+    def test_concurrent_same_as_sequential(self):
+        parser = parse_file(corpus / '2112-overture.btab')
+        parser.export(self.outputs('sequential'), writer='direct')
+        parser.export(self.outputs('concurrent'), writer='direct', concurrent=True)
+        for output_format, file_name in self.outputs('sequential').items():
+            with self.subTest(format=output_format):
+                self.assertEqual(file_name.read_bytes(), self.outputs('concurrent')[output_format].read_bytes())
+
+    def test_concurrent_failure(self):
+        parser = parse_file(corpus / '2112-tears.btab')
+        outputs = self.outputs('song')
+        outputs['midi'] = self.dir / 'missing' / 'song.mid'
+        with self.assertRaises(BtabParser_ExportException):
+            parser.export(outputs, writer='direct', concurrent=True)
+        self.assertTrue(outputs['musicxml'].exists())
+
+    def test_convert_file(self):
+        out_file = self.dir / 'song.mid'
+        self.assertTrue(convert_file(corpus / '2112-tears.btab', out_file, formats=['midi', 'json', 'musicxml']))
+        self.assertEqual(sorted(f.name for f in self.dir.iterdir()), ['song.json', 'song.mid', 'song.xml'])
+        self.assertTrue(out_file.read_bytes().startswith(b'MThd'))
+
+    def test_stream_writer(self):
+        with mock.patch('sys.argv', ['btab2mxml', '--writer', 'stream', '--format', 'musicxml,midi']), \
+                mock.patch('sys.stderr', io.StringIO()), self.assertRaises(SystemExit):
+            parse_args()
+
+
+if __name__ == '__main__':
+    unittest.main()
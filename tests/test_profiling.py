@@ -0,0 +1,54 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from btab2mxml.main import convert_file
+from btab2mxml.profiling import Profiler, merge_reports
+from tests.helpers import corpus
+
+
+class TestProfiler(unittest.TestCase):
+    def test_nested_stages(self):
+        profiler = Profiler(trace_memory=False)
+        with profiler.stage('parser'):
+            time.sleep(0.01)
+            with profiler.stage('tokenizer'):
+                time.sleep(0.02)
+        report = profiler.report()
+        self.assertEqual(report['stages']['parser']['calls'], 1)
+        self.assertEqual(report['stages']['tokenizer']['calls'], 1)
+        # Time of the nested stage is not counted in the outer one
+        self.assertLess(report['stages']['parser']['time'], 0.02)
+        self.assertGreaterEqual(report['stages']['tokenizer']['time'], 0.02)
+
+    def test_instrument(self):
+        class Reader:
+            def read(self, value):
+                return value * 2
+        reader = Reader()
+        profiler = Profiler(trace_memory=False)
+        profiler.instrument(reader, ('read',), 'reader')
+        self.assertEqual(reader.read(2), 4)
+        self.assertEqual(reader.read(3), 6)
+        self.assertEqual(profiler.report()['stages']['reader']['calls'], 2)
+
+    def test_merge_reports(self):
+        report = {'total_time': 1.0,
+                  'stages': {'parser': {'calls': 1, 'time': 1.0, 'allocated': 10}},
+                  'tokens': {'NoteToken': {'count': 3, 'time': 0.5, 'allocated': 5}}}
+        merged = merge_reports([report, report])
+        self.assertEqual(merged['total_time'], 2.0)
+        self.assertEqual(merged['stages']['parser'], {'calls': 2, 'time': 2.0, 'allocated': 20})
+        self.assertEqual(merged['tokens']['NoteToken']['count'], 6)
+
+    def test_convert_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out_file = Path(tmp) / '2112-overture.xml'
+            self.assertTrue(convert_file(corpus / '2112-overture.btab', out_file,
+                                         writer='direct', profile=True))
+            with open(out_file.with_suffix('.profile.json'), encoding='utf-8') as f:
+                report = json.load(f)
+        self.assertEqual(set(report['stages']), {'reader', 'tokenizer', 'parser', 'output'})
+        self.assertGreater(report['tokens']['NoteToken']['count'], 0)
+        self.assertGreater(report['stages']['parser']['allocated'], 0)
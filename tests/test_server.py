@@ -0,0 +1,99 @@
+import http.client
+import threading
+import time
+import unittest
+from btab2mxml.server import ConversionServer
+from tests.helpers import corpus
+
+
+def slow_convert(text, writer):
+    time.sleep(float(text))
+    return True, b'<score-partwise/>'
+
+
+class SlowConversionServer(ConversionServer):
+    convert_function = staticmethod(slow_convert)
+
+
+class ServerTestCase(unittest.TestCase):
+    server_class = ConversionServer
+    options = {}
+
+    def setUp(self):
+        self.server = self.server_class(('127.0.0.1', 0), nb_workers=1, **self.options)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=30)
+        try:
+            connection.request(method, path, body=body)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def raw_request(self, content_length, body=b''):
+        """ POST body to /convert, with content_length as Content-Length header unless None.
+        """
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=30)
+        try:
+            connection.putrequest('POST', '/convert')
+            if content_length is not None:
+                connection.putheader('Content-Length', content_length)
+            connection.endheaders(body)
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+
+class TestConversionServer(ServerTestCase):
+    def test_convert(self):
+        text = (corpus / '2112-tears.btab').read_bytes()
+        status, body = self.request('POST', '/convert', text)
+        self.assertEqual(status, 200)
+        self.assertIn(b'<score-partwise', body)
+        status, body = self.request('POST', '/convert?writer=direct', text)
+        self.assertEqual(status, 200)
+        self.assertIn(b'<work-title>Tears</work-title>', body)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request('GET', '/health'), (200, b'ok\n'))
+        self.assertEqual(self.request('POST', '/other', b'')[0], 404)
+        self.assertEqual(self.request('POST', '/convert?writer=other', b'')[0], 400)
+
+    def test_content_length(self):
+        self.assertEqual(self.raw_request(None), 411)
+        self.assertEqual(self.raw_request('abc'), 400)
+        self.assertEqual(self.raw_request('-1'), 400)
+
+
+class TestServerLimits(ServerTestCase):
+    server_class = SlowConversionServer
+    options = {'queue_size': 0, 'request_timeout': 0.5, 'max_body_size': 8}
+
+    def test_timeout(self):
+        self.assertEqual(self.request('POST', '/convert', b'0.1'), (200, b'<score-partwise/>'))
+        self.assertEqual(self.request('POST', '/convert', b'2')[0], 504)
+
+    def test_body_size(self):
+        self.assertEqual(self.request('POST', '/convert', b'0.000001')[0], 200)
+        self.assertEqual(self.request('POST', '/convert', b'0.0000001')[0], 413)
+
+    def test_backpressure(self):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.request('POST', '/convert', b'0.4')))
+        thread.start()
+        time.sleep(0.2)
+        # The only worker is busy, and no request may wait
+        self.assertEqual(self.request('POST', '/convert', b'0')[0], 503)
+        thread.join()
+        self.assertEqual(results[0][0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from btab2mxml.btab import token_cache
+from btab2mxml.btab.btab_reader import BtabMmapReader
+from btab2mxml.btab.btab_tokenizer import BtabTokenizer
+from btab2mxml.btab.token import EndToken, NoteToken, GHOST
+from btab2mxml.btab.token_cache import (TokenCacheFormatException, TokenRecorder, TokenReplayer, cached_tokenizer,
+                                        dump_tokens, get_cache_file, get_source_digest, load_tokens)
+from btab2mxml.main import convert_file
+from tests.helpers import corpus
+
+digest = bytes(32)
+
+
+def token_values(tokens):
+    return [(t.__class__, t.get_value()) for t in tokens]
+
+
+class TestTokenCache(unittest.TestCase):
+    def test_round_trip(self):
+        for file_name in sorted(corpus.glob('*.btab')):
+            with self.subTest(file=file_name.name):
+                tokens = list(BtabTokenizer(BtabMmapReader(file_name)))
+                self.assertEqual(token_values(load_tokens(dump_tokens(tokens, digest), digest)),
+                                 token_values(tokens))
+
+    def test_frets(self):
+        tokens = [NoteToken('q', (None, 3, GHOST, '(5)', 300)), NoteToken('', (None, 3, GHOST, '(5)', 300)),
+                  NoteToken('é', (1, 2)), NoteToken('e', (1, 2)), EndToken()]
+        self.assertEqual(token_values(load_tokens(dump_tokens(tokens, digest), digest)), token_values(tokens))
+
+    def test_invalidation(self):
+        data = dump_tokens([EndToken()], digest)
+        self.assertEqual(len(load_tokens(data, digest)), 1)
+        self.assertIsNone(load_tokens(data, bytes([1] * 32)))
+        with mock.patch.object(token_cache, 'TOKENIZER_VERSION', token_cache.TOKENIZER_VERSION + 1):
+            self.assertIsNone(load_tokens(data, digest))
+        self.assertIsNone(load_tokens(b'', digest))
+
+    def test_truncated(self):
+        tokens = list(BtabTokenizer(BtabMmapReader(corpus / '2112-tears.btab')))
+        data = dump_tokens(tokens, digest)
+        with self.assertRaises(TokenCacheFormatException):
+            load_tokens(data[:-1], digest)
+        with self.assertRaises(TokenCacheFormatException):
+            load_tokens(data[:len(data) // 2], digest)
+
+    def test_corrupted(self):
+        tokens = list(BtabTokenizer(BtabMmapReader(corpus / '2112-tears.btab')))
+        data = bytearray(dump_tokens(tokens, digest))
+        # First byte of the first header line: invalid UTF-8
+        line = tokens[0].value.encode('utf-8')
+        data[data.index(line)] = 0xFF
+        with self.assertRaises(TokenCacheFormatException):
+            load_tokens(bytes(data), digest)
+
+
+class TestCachedTokenizer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmpdir.name)
+        self.in_file = self.dir / 'song.btab'
+        self.in_file.write_bytes((corpus / '2112-tears.btab').read_bytes())
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_record_then_replay(self):
+        expected = token_values(BtabTokenizer(BtabMmapReader(self.in_file)))
+        cache_file = get_cache_file(self.in_file)
+        self.assertEqual(cache_file, self.dir / 'song.btab.btok')
+
+        tokenizer = cached_tokenizer(self.in_file)
+        self.assertIsInstance(tokenizer, TokenRecorder)
+        self.assertEqual(token_values(tokenizer), expected)
+        self.assertTrue(cache_file.exists())
+
+        tokenizer = cached_tokenizer(self.in_file)
+        self.assertIsInstance(tokenizer, TokenReplayer)
+        self.assertIsNone(tokenizer.reader)
+        tokens = [tokenizer.get_next_token() for _ in expected]
+        self.assertEqual(token_values(tokens), expected)
+        self.assertIsInstance(tokenizer.get_next_token(), EndToken)
+
+        # Edited source: tokenized again
+        with open(self.in_file, 'a') as f:
+            f.write('\n')
+        self.assertIsInstance(cached_tokenizer(self.in_file), TokenRecorder)
+
+    def test_invalid_cache(self):
+        cache_file = get_cache_file(self.in_file, self.dir / 'cache')
+        cache_file.parent.mkdir()
+        cache_file.write_bytes(dump_tokens([EndToken()], get_source_digest(self.in_file))[:-1])
+        with self.assertLogs(level='WARNING'):
+            tokenizer = cached_tokenizer(self.in_file, cache_file.parent)
+        self.assertIsInstance(tokenizer, TokenRecorder)
+
+    def test_corrupted_cache(self):
+        cache_file = get_cache_file(self.in_file)
+        list(cached_tokenizer(self.in_file))
+        data = bytearray(cache_file.read_bytes())
+        title = b'Tears'
+        data[data.index(title)] = 0xFF
+        cache_file.write_bytes(bytes(data))
+        with self.assertLogs(level='WARNING'):
+            tokenizer = cached_tokenizer(self.in_file)
+        self.assertIsInstance(tokenizer, TokenRecorder)
+        list(tokenizer)
+        # Rebuilt
+        self.assertIsInstance(cached_tokenizer(self.in_file), TokenReplayer)
+
+    def test_convert_file(self):
+        cache_dir = self.dir / 'cache'
+        outputs = []
+        for _ in range(2):
+            out_file = self.dir / f'song{len(outputs)}.xml'
+            self.assertTrue(convert_file(self.in_file, out_file, writer='direct', token_cache=str(cache_dir)))
+            outputs.append(out_file.read_bytes())
+        self.assertTrue((cache_dir / 'song.btab.btok').exists())
+        self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from btab2mxml.watcher import Watcher
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.first = self.dir / 'first.btab'
+        self.first.write_text('first')
+        self.watcher = Watcher(lambda: sorted(self.dir.glob('*.btab')), debounce=0.5)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def touch(self, file_name, content):
+        file_name.write_text(content)
+        # Make sure the modification time changes, whatever the file system resolution
+        stat = file_name.stat()
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_no_change(self):
+        self.assertEqual(self.watcher.poll(now=10), [])
+
+    def test_debounce(self):
+        self.touch(self.first, 'modified')
+        self.assertEqual(self.watcher.poll(now=10), [])
+        self.touch(self.first, 'modified again')
+        self.assertEqual(self.watcher.poll(now=10.4), [])
+        self.assertEqual(self.watcher.poll(now=10.8), [])
+        self.assertEqual(self.watcher.poll(now=11), [self.first])
+        self.assertEqual(self.watcher.poll(now=12), [])
+
+    def test_new_and_removed_files(self):
+        second = self.dir / 'second.btab'
+        self.touch(second, 'second')
+        self.touch(self.first, 'modified')
+        self.watcher.poll(now=10)
+        self.first.unlink()
+        self.assertEqual(self.watcher.poll(now=11), [second])
+
+
+if __name__ == '__main__':
+    unittest.main()